@@ -0,0 +1,397 @@
+"""Load-generation benchmark for the Privacy-Pac quiz server.
+
+Plays simulated visitors through the page flow, the question fetch and five
+answer submissions while GPIO producers post button presses and SSE
+subscribers consume them. Reports throughput and latency percentiles per
+endpoint, press-to-delivery latency and SQLite write-lock waits.
+
+    python benchmark.py                       # in-process against a DB copy
+    python benchmark.py --url http://localhost:5004
+"""
+import os
+import sys
+import re
+import json
+import time
+import random
+import shutil
+import sqlite3
+import tempfile
+import argparse
+import threading
+import importlib.util
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import wire
+from latency import new_trace_id
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_FILE = os.path.join(BASE_DIR, "privacy-app.py")
+DATABASE = os.path.join(BASE_DIR, "database/quiz_data.db")
+NAVIGATION_START = "/"
+QUESTIONS_PER_QUIZ = 5
+BOOTSTRAP_RE = re.compile(rb'id="quiz-bootstrap" type="application/json">(.*?)</script>', re.S)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return 0.0
+    index = max(0, int(round(pct / 100.0 * len(samples))) - 1)
+    return samples[min(index, len(samples) - 1)]
+
+
+class Recorder:
+    """Thread-safe latency samples keyed by label"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, label, seconds, ok=True):
+        with self.lock:
+            self.samples[label].append(seconds)
+            if not ok:
+                self.errors[label] += 1
+
+    def summary(self, elapsed):
+        rows = {}
+        with self.lock:
+            for label, values in sorted(self.samples.items()):
+                values = sorted(values)
+                rows[label] = {
+                    "count": len(values),
+                    "errors": self.errors[label],
+                    "rps": len(values) / elapsed if elapsed else 0.0,
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p95_ms": percentile(values, 95) * 1000,
+                    "p99_ms": percentile(values, 99) * 1000,
+                }
+        return rows
+
+
+class InProcessClient:
+    """Drive the Flask app through its test client"""
+
+    def __init__(self, app):
+        self.app = app
+
+    def get(self, path):
+        response = self.app.test_client().get(path)
+        return response.status_code, response.get_data()
+
+    def post(self, path, payload):
+        response = self.app.test_client().post(path, json=payload)
+        return response.status_code, response.get_data()
+
+    def stream(self, path):
+        response = self.app.test_client().get(path, buffered=False)
+        try:
+            for chunk in response.response:
+                for line in chunk.decode().splitlines():
+                    yield line
+        finally:
+            response.close()
+
+
+class HttpClient:
+    """Drive a running server over HTTP"""
+
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip("/")
+        self.local = threading.local()
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = self.requests.Session()
+        return self.local.session
+
+    def get(self, path):
+        response = self.session().get(self.base_url + path, timeout=10)
+        return response.status_code, response.content
+
+    def post(self, path, payload):
+        response = self.session().post(self.base_url + path, json=payload, timeout=10)
+        return response.status_code, response.content
+
+    def stream(self, path):
+        with self.requests.get(self.base_url + path, stream=True, timeout=10) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                yield line or ""
+
+
+def load_app(database):
+    """Import privacy-app.py and point it at the given database"""
+    sys.path.insert(0, BASE_DIR)
+    spec = importlib.util.spec_from_file_location("privacy_app", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.DATABASE = database
+    return module.app
+
+
+class Benchmark:
+    def __init__(self, client, args, database=None):
+        self.client = client
+        self.args = args
+        self.database = database
+        self.latency = Recorder()
+        self.delivery = Recorder()
+        self.lock_waits = Recorder()
+        self.sent = {}        # trace_id -> perf_counter() when the press was posted (None: primer)
+        self.delivered = []   # One set of delivered trace_ids per subscriber
+        self.pending_lock = threading.Lock()
+        self.stop = threading.Event()
+        self.stream_bytes = 0
+        self.stream_frames = 0
+
+    def timed_get(self, path, label=None):
+        start = time.perf_counter()
+        status, body = self.client.get(path)
+        self.latency.add(label or path, time.perf_counter() - start, status < 400)
+        return status, body
+
+    def timed_post(self, path, payload, label=None):
+        start = time.perf_counter()
+        status, body = self.client.post(path, payload)
+        self.latency.add(label or path, time.perf_counter() - start, status < 400)
+        return status, body
+
+    def visitor(self, set_id):
+        """One visitor: navigation pages, quiz, answers and result page"""
+        page = NAVIGATION_START
+        while page and page != "/loading":
+            self.timed_get(page, "GET <page>")
+            status, body = self.timed_post(
+                "/handle-navigation",
+                {"current_page": page, "choice": "right"}
+            )
+            page = json.loads(body).get("redirect") if status == 200 else None
+        self.timed_get("/loading", "GET <page>")
+        # The quiz page arrives with its session and questions inlined
+        status, body = self.timed_get(f"/quiz?set_id={set_id}", "GET /quiz")
+        match = BOOTSTRAP_RE.search(body) if status == 200 else None
+        bootstrap = json.loads(match.group(1)) if match else None
+        if bootstrap:
+            questions, session_id = bootstrap["questions"], bootstrap["session_id"]
+        else:
+            status, body = self.timed_get(f"/fetch_questions?set_id={set_id}", "/fetch_questions")
+            questions = json.loads(body) if status == 200 else []
+            session_id = None
+        right = 0
+        for question in questions[:QUESTIONS_PER_QUIZ]:
+            choice = random.choice(["left", "right"])
+            right += choice == "right"
+            status, body = self.timed_post("/submit_response", {
+                "session_id": session_id,
+                "question_id": question["id"],
+                "choice": choice
+            })
+            if status == 200 and not session_id:
+                session_id = json.loads(body).get("session_id")
+        self.timed_get(f"/{min(right, 5)}", "GET <page>")
+
+    def producer(self, presses, interval):
+        for _ in range(presses):
+            if self.stop.is_set():
+                break
+            trace_id = new_trace_id()
+            with self.pending_lock:
+                self.sent[trace_id] = time.perf_counter()
+            status, _ = self.timed_post("/gpio-button-press", {
+                "choice": random.choice(["left", "right"]),
+                "trace_id": trace_id
+            })
+            if status >= 400:
+                with self.pending_lock:
+                    self.sent.pop(trace_id, None)
+            time.sleep(interval)
+
+    def subscriber(self, delivered):
+        """Consume one event stream; every press must reach every subscriber"""
+        for line in self.client.stream("/gpio-events"):
+            with self.pending_lock:
+                self.stream_bytes += len(line) + 1
+            if line.startswith("data:"):
+                received = time.perf_counter()
+                events = wire.decode(line[5:])[1]
+                samples = []
+                with self.pending_lock:
+                    self.stream_frames += 1
+                    for event in events:
+                        trace_id = event.get("trace_id")
+                        if trace_id in self.sent and trace_id not in delivered:
+                            delivered.add(trace_id)
+                            if self.sent[trace_id] is not None:
+                                samples.append(received - self.sent[trace_id])
+                for sample in samples:
+                    self.delivery.add("press-to-delivery", sample)
+            if self.stop.is_set():
+                break
+
+    def wait_for_subscribers(self, timeout=5.0):
+        """Post untimed primer presses until every subscriber has received one.
+
+        A stream only subscribes once it is first read, so without this the
+        first timed presses can be sent before a stream exists to carry them.
+        """
+        primers = set()
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            trace_id = new_trace_id()
+            with self.pending_lock:
+                self.sent[trace_id] = None
+                primers.add(trace_id)
+            self.client.post("/gpio-button-press", {"choice": "left", "trace_id": trace_id})
+            time.sleep(0.05)
+            with self.pending_lock:
+                if all(primers & delivered for delivered in self.delivered):
+                    break
+        with self.pending_lock:
+            for trace_id in primers:
+                self.sent.pop(trace_id)
+            for delivered in self.delivered:
+                delivered -= primers
+
+    def lock_probe(self, interval=0.05):
+        """Measure how long a writer waits for the SQLite reserved lock"""
+        conn = sqlite3.connect(self.database, timeout=30, isolation_level=None)
+        try:
+            while not self.stop.is_set():
+                start = time.perf_counter()
+                conn.execute("BEGIN IMMEDIATE")
+                self.lock_waits.add("sqlite write-lock wait", time.perf_counter() - start)
+                conn.execute("ROLLBACK")
+                time.sleep(interval)
+        finally:
+            conn.close()
+
+    def run(self):
+        args = self.args
+        background = []
+        for _ in range(args.subscribers):
+            delivered = set()
+            self.delivered.append(delivered)
+            background.append(threading.Thread(target=self.subscriber, args=(delivered,), daemon=True))
+        if self.database:
+            background.append(threading.Thread(target=self.lock_probe, daemon=True))
+        for thread in background:
+            thread.start()
+        if args.subscribers:
+            self.wait_for_subscribers()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency + args.producers) as pool:
+            producers = [
+                pool.submit(self.producer, args.presses, args.press_interval)
+                for _ in range(args.producers)
+            ]
+            visitors = [
+                pool.submit(self.visitor, random.choice(args.sets))
+                for _ in range(args.visitors)
+            ]
+            for future in visitors + producers:
+                future.result()
+        elapsed = time.perf_counter() - start
+
+        # Give subscribers a moment to drain queued presses
+        deadline = time.time() + 2
+        while any(self.undelivered()) and time.time() < deadline:
+            time.sleep(0.05)
+        self.stop.set()
+        for thread in background:
+            thread.join(timeout=2)
+        return elapsed
+
+    def undelivered(self):
+        """Posted presses each subscriber has not received yet"""
+        with self.pending_lock:
+            return [len(self.sent.keys() - delivered) for delivered in self.delivered]
+
+    def report(self, elapsed):
+        undelivered = self.undelivered()
+        return {
+            "elapsed_s": elapsed,
+            "visitors": self.args.visitors,
+            "visitors_per_s": self.args.visitors / elapsed if elapsed else 0.0,
+            "endpoints": self.latency.summary(elapsed),
+            "delivery": self.delivery.summary(elapsed),
+            "undelivered_presses": sum(undelivered),
+            "undelivered_per_subscriber": undelivered,
+            "stream_frames": self.stream_frames,
+            "stream_bytes_per_subscriber_s": (
+                self.stream_bytes / self.args.subscribers / elapsed
+                if self.args.subscribers and elapsed else 0.0
+            ),
+            "sqlite": self.lock_waits.summary(elapsed),
+        }
+
+
+def print_report(report):
+    print(f"\nVisitors: {report['visitors']} in {report['elapsed_s']:.2f}s "
+          f"({report['visitors_per_s']:.1f}/s)")
+    header = f"{'endpoint':<28}{'count':>8}{'err':>6}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for section in ("endpoints", "delivery", "sqlite"):
+        for label, row in report[section].items():
+            print(f"{label:<28}{row['count']:>8}{row['errors']:>6}{row['rps']:>9.1f}"
+                  f"{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['p99_ms']:>10.2f}")
+    print(f"Undelivered presses: {report['undelivered_presses']} "
+          f"(per subscriber: {report['undelivered_per_subscriber']})")
+    print(f"Event stream: {report['stream_frames']} frames, "
+          f"{report['stream_bytes_per_subscriber_s']:.0f} bytes/s per subscriber")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Privacy-Pac load benchmark")
+    parser.add_argument("--url", help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--database", default=DATABASE,
+                        help="Database to copy for in-process runs, or to probe for lock waits")
+    parser.add_argument("--visitors", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--subscribers", type=int, default=2)
+    parser.add_argument("--producers", type=int, default=2)
+    parser.add_argument("--presses", type=int, default=50, help="Presses per producer")
+    parser.add_argument("--press-interval", type=float, default=0.05)
+    parser.add_argument("--sets", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    workdir = None
+    if args.url:
+        client = HttpClient(args.url)
+        database = args.database if os.path.exists(args.database) else None
+    else:
+        # Producers press far faster than a visitor; keep admission control out of the numbers
+        os.environ.setdefault("INGRESS_RATE", "1000")
+        os.environ.setdefault("INGRESS_BURST", "1000")
+        # Never write benchmark traffic into the real database
+        workdir = tempfile.mkdtemp(prefix="privacy-pac-bench-")
+        database = os.path.join(workdir, "quiz_data.db")
+        shutil.copy(args.database, database)
+        client = InProcessClient(load_app(database))
+
+    try:
+        bench = Benchmark(client, args, database)
+        report = bench.report(bench.run())
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""Per-subscriber event buffers with backpressure for the kiosk streams.
+
+Every /gpio-events stream (and, in the Socket.IO app, every connected
+client) gets its own bounded buffer, so a frozen tab or a weak Wi-Fi link
+only ever holds up itself. What happens when a buffer is full is set by
+STREAM_POLICY:
+
+    drop_oldest   discard the oldest buffered event (default)
+    coalesce      collapse the buffer to the newest event per kind
+    disconnect    close the subscriber once it is full or its oldest
+                  event is more than STREAM_MAX_LAG seconds old
+
+Publishing never blocks on a subscriber: it only appends to deques under
+a short lock, and all network writes happen outside it. Events published
+while nobody is subscribed (e.g. between two page loads) wait in a small
+backlog that the next subscriber takes over.
+"""
+import os
+import time
+import socket
+import threading
+from collections import deque, OrderedDict
+
+import metrics
+import wire
+
+POLICIES = ("drop_oldest", "coalesce", "disconnect")
+STREAM_POLICY = os.environ.get("STREAM_POLICY", "drop_oldest")
+STREAM_BUFFER = int(os.environ.get("STREAM_BUFFER", "64"))
+STREAM_MAX_LAG = float(os.environ.get("STREAM_MAX_LAG", "10"))
+WRITE_TIMEOUT = float(os.environ.get("STREAM_WRITE_TIMEOUT", "5"))
+BACKLOG_LIMIT = 100
+# Kernel keepalive probes: idle seconds, interval, count before a peer is dead
+TCP_KEEPALIVE = (("TCP_KEEPIDLE", 10), ("TCP_KEEPINTVL", 5), ("TCP_KEEPCNT", 3))
+
+
+class Subscriber:
+    def __init__(self, broker, key=None):
+        self.broker = broker
+        self.key = key
+        self.buffer = deque()  # (queued_at, event)
+        self.closed = False
+
+    def _push(self, event, now):
+        """Buffer one event under the broker lock, applying the policy"""
+        broker = self.broker
+        if broker.policy == "disconnect" and self.buffer and now - self.buffer[0][0] > broker.max_lag:
+            self._close("lagging")
+            return
+        if len(self.buffer) >= broker.capacity:
+            if broker.policy == "disconnect":
+                self._close("overflow")
+                return
+            if broker.policy == "coalesce":
+                self._coalesce()
+            if len(self.buffer) >= broker.capacity:
+                self.buffer.popleft()
+                metrics.EVENTS_DROPPED.inc(queue=broker.name)
+        self.buffer.append((now, event))
+
+    def _coalesce(self):
+        latest = OrderedDict()
+        for item in self.buffer:
+            key = self.broker.coalesce_key(item[1])
+            latest.pop(key, None)
+            latest[key] = item
+        dropped = len(self.buffer) - len(latest)
+        if dropped:
+            metrics.EVENTS_DROPPED.inc(dropped, queue=self.broker.name)
+        self.buffer = deque(latest.values())
+
+    def _close(self, reason):
+        if not self.closed:
+            self.closed = True
+            self.buffer.clear()
+            metrics.SLOW_CONSUMER_DISCONNECTS.inc(stream=self.broker.name, reason=reason)
+            self.broker.ready.notify_all()
+
+    def get(self, limit, timeout):
+        """Wait up to `timeout` for events and take up to `limit` of them"""
+        with self.broker.ready:
+            self.broker.ready.wait_for(lambda: self.buffer or self.closed, timeout=timeout)
+            count = min(limit, len(self.buffer))
+            return [self.buffer.popleft()[1] for _ in range(count)]
+
+    def pending(self):
+        with self.broker.lock:
+            return len(self.buffer)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self, name, capacity=STREAM_BUFFER, policy=STREAM_POLICY, max_lag=STREAM_MAX_LAG,
+                 coalesce_key=wire.coalesce_key):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown stream policy {policy!r}; expected one of {POLICIES}")
+        self.name = name
+        self.capacity = capacity
+        self.policy = policy
+        self.max_lag = max_lag
+        self.coalesce_key = coalesce_key
+        self.subscribers = []
+        self.backlog = deque(maxlen=BACKLOG_LIMIT)
+        self.lock = threading.Lock()
+        self.ready = threading.Condition(self.lock)
+
+    def subscribe(self, key=None):
+        subscriber = Subscriber(self, key)
+        with self.lock:
+            now = time.monotonic()
+            while self.backlog:
+                subscriber._push(self.backlog.popleft(), now)
+            self.subscribers.append(subscriber)
+            metrics.QUEUE_DEPTH.set(0, queue=self.name)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+            subscriber.closed = True
+            self.ready.notify_all()
+
+    def publish(self, event, skip=None):
+        """Fan an event out to every subscriber except the one keyed `skip`"""
+        now = time.monotonic()
+        with self.lock:
+            live = [s for s in self.subscribers if not s.closed]
+            if not live:
+                if len(self.backlog) == self.backlog.maxlen:
+                    metrics.EVENTS_DROPPED.inc(queue=self.name)
+                self.backlog.append(event)
+                metrics.QUEUE_DEPTH.set(len(self.backlog), queue=self.name)
+            for subscriber in live:
+                if subscriber.key is None or subscriber.key != skip:
+                    subscriber._push(event, now)
+            self.ready.notify_all()
+        metrics.EVENTS_QUEUED.inc(queue=self.name)
+
+
+def guard_connection(environ, write_timeout=WRITE_TIMEOUT):
+    """Bound blocking writes and turn on TCP keepalive for a streaming response.
+
+    A client that stops reading fills the kernel send buffer; the write
+    timeout then fails the blocked write instead of parking the thread
+    forever. Keepalive probes find peers that vanished without a FIN.
+    """
+    sock = environ.get("werkzeug.socket") or environ.get("gunicorn.socket")
+    if sock is None:
+        return False
+    try:
+        sock.settimeout(write_timeout)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in TCP_KEEPALIVE:
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+    except OSError:
+        return False
+    return True
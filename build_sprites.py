@@ -0,0 +1,195 @@
+"""Pack button state images into one sprite atlas per stylesheet.
+
+Every button on a page draws all of its states (normal, hover, pressed)
+from one atlas, so the first hover or press never fetches or decodes a
+new image. The frames of a button are scaled to fit one cell and centred,
+so switching state never changes the button's size. The CSS that places
+each frame is written into the page stylesheet between the
+`sprites:begin` / `sprites:end` markers (appended if they are missing):
+
+    python build_sprites.py            # rebuild atlases and CSS
+    python build_sprites.py --check    # exit 1 if they are out of date
+
+Edit ATLASES below, not the generated CSS.
+"""
+import os
+import re
+import sys
+import argparse
+
+try:
+    from PIL import Image
+except ImportError:
+    print("Error: Pillow not found")
+    print("Run: pip install Pillow")
+    exit(1)
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+GUTTER = 2  # Transparent pixels between cells so scaled frames never bleed
+BEGIN = "/* sprites:begin - generated by build_sprites.py, do not edit */"
+END = "/* sprites:end */"
+BLOCK = re.compile(re.escape(BEGIN) + r".*?" + re.escape(END) + r"\n?", re.S)
+
+# States map a selector suffix to a source image; "" is the resting state.
+# `element` is the sprite element relative to the button, `size` how it is sized
+# and `aspect` (width / height) pads every cell to the button's own box.
+ATLASES = [
+    {
+        "image": "sprites-buttons.png",
+        "stylesheet": "b-style.css",
+        "element": " .sprite",
+        "size": "width: 100%;",
+        "buttons": {
+            ".start-button": {"": "start-normal.png", ":hover": "start-hover.png",
+                              ":active": "start-active.png"},
+            ".continue-button": {"": "cont-normal.png", ":active": "cont-active.png"},
+        },
+    },
+    {
+        "image": "sprites-results.png",
+        "stylesheet": "style-0.css",
+        "element": " .sprite",
+        "size": "height: 100%; max-width: 100%;",
+        "buttons": {
+            ".start-button": {"": "newgame.png", ":hover": "newgamehover1.png",
+                              ":active": "newgamehover2.png"},
+            ".finish-button": {"": "finish.png", ":hover": "finishhover1.png",
+                               ":active": "finishhover2.png"},
+        },
+    },
+    {
+        "image": "sprites-arrows.png",
+        "stylesheet": "styles.css",
+        "element": "",
+        "size": None,  # .option-button is a fixed square
+        "aspect": 1.0,
+        "buttons": {
+            "#left-button": {"": "arrow-b-L-Default.png", ":hover": "arrow-b-L-hower.png",
+                             ":active": "arrow-b-L-prssed.png"},
+            "#right-button": {"": "arrow-b-R-Default.png", ":hover": "arrow-b-R-hower.png",
+                              ":active": "arrow-b-R-prssed.png"},
+        },
+    },
+]
+
+
+def cell_size(frames, aspect=None):
+    """Smallest cell every frame fits in, widened or heightened to `aspect`"""
+    width = max(frame.width for frame in frames)
+    height = max(frame.height for frame in frames)
+    if aspect:
+        if width / height < aspect:
+            width = round(height * aspect)
+        else:
+            height = round(width / aspect)
+    return width, height
+
+
+def fit(frame, cell):
+    """Scale a frame to fit the cell (keeping its aspect) and centre it"""
+    scale = min(cell[0] / frame.width, cell[1] / frame.height)
+    size = (round(frame.width * scale), round(frame.height * scale))
+    if size != frame.size:
+        frame = frame.resize(size, Image.LANCZOS)
+    canvas = Image.new("RGBA", cell, (0, 0, 0, 0))
+    canvas.paste(frame, ((cell[0] - size[0]) // 2, (cell[1] - size[1]) // 2))
+    return canvas
+
+
+def percent(value):
+    return f"{value:.4f}".rstrip("0").rstrip(".") + "%"
+
+
+def build_atlas(spec, static_dir=STATIC_DIR):
+    """Returns (atlas image, CSS block) for one atlas spec"""
+    layout = []  # (selector, cell, [(state, frame)])
+    for selector, states in spec["buttons"].items():
+        frames = [(state, Image.open(os.path.join(static_dir, name)).convert("RGBA"))
+                  for state, name in states.items()]
+        cell = cell_size([frame for _, frame in frames], spec.get("aspect"))
+        layout.append((selector, cell, [(state, fit(frame, cell)) for state, frame in frames]))
+
+    atlas_width = max(cell[0] for _, cell, _ in layout)
+    atlas_height = sum((cell[1] + GUTTER) * len(frames) for _, cell, frames in layout) - GUTTER
+    atlas = Image.new("RGBA", (atlas_width, atlas_height), (0, 0, 0, 0))
+
+    url = f"/static/{spec['image']}"
+    rules = []
+    y = 0
+    for selector, (width, height), frames in layout:
+        target = f"{selector}{spec['element']}"
+        # Percentages keep the frame aligned however large the button is drawn
+        size_x = percent(atlas_width / width * 100)
+        size_y = percent(atlas_height / height * 100)
+        base = [f'background-image: url("{url}");', "background-repeat: no-repeat;",
+                f"background-size: {size_x} {size_y};"]
+        if spec["size"]:
+            base = ["display: block;", spec["size"], f"aspect-ratio: {width} / {height};"] + base
+        for state, frame in frames:
+            atlas.paste(frame, (0, y))
+            offset = y / (atlas_height - height) * 100 if atlas_height > height else 0
+            position = f"background-position: 0 {percent(offset)};"
+            if state == "":
+                rules.append(f"{target} {{\n    " + "\n    ".join(base + [position]) + "\n}")
+            else:
+                # GPIO presses set .active on the button (page_handler.js, quiz_logic.js)
+                selectors = [f"{selector}{state}{spec['element']}"]
+                if state == ":active":
+                    selectors.append(f"{selector}.active{spec['element']}")
+                rules.append(f"{', '.join(selectors)} {{\n    {position}\n}}")
+            y += height + GUTTER
+
+    css = f"{BEGIN}\n" + "\n\n".join(rules) + f"\n{END}\n"
+    return atlas, css
+
+
+def same_pixels(path, atlas):
+    """Compare decoded pixels; PNG bytes differ between zlib builds"""
+    if not os.path.exists(path):
+        return False
+    with Image.open(path) as current:
+        return current.size == atlas.size and current.convert("RGBA").tobytes() == atlas.tobytes()
+
+
+def with_block(stylesheet, css):
+    if BLOCK.search(stylesheet):
+        return BLOCK.sub(lambda _: css, stylesheet, count=1)
+    return stylesheet.rstrip("\n") + "\n\n" + css
+
+
+def build(static_dir=STATIC_DIR, check=False):
+    """Write every atlas and stylesheet block; returns the files that were (or would be) changed"""
+    changed = []
+    for spec in ATLASES:
+        atlas, css = build_atlas(spec, static_dir)
+        image_path = os.path.join(static_dir, spec["image"])
+        css_path = os.path.join(static_dir, spec["stylesheet"])
+        with open(css_path) as f:
+            stylesheet = f.read()
+        updated = with_block(stylesheet, css)
+
+        if not same_pixels(image_path, atlas):
+            changed.append(image_path)
+            if not check:
+                atlas.save(image_path, "PNG", optimize=True)
+        if updated != stylesheet:
+            changed.append(css_path)
+            if not check:
+                with open(css_path, "w") as f:
+                    f.write(updated)
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build button sprite atlases")
+    parser.add_argument("--static-dir", default=STATIC_DIR)
+    parser.add_argument("--check", action="store_true", help="Only report out-of-date files")
+    args = parser.parse_args()
+
+    changed = build(args.static_dir, args.check)
+    for path in changed:
+        print(f"{'Out of date' if args.check else 'Wrote'}: {os.path.relpath(path)}")
+    if not changed:
+        print("✅ Sprite atlases are up to date")
+    elif args.check:
+        sys.exit(1)
@@ -1,53 +1,84 @@
 try:
-    import RPi.GPIO as GPIO
+    import os
     import time
-    import requests
-    from requests.exceptions import RequestException
+    import threading
     import logging
+    from collections import deque
+    from startup import lazy_import, log_ready
+    # Loaded on the connector thread, after the buttons are already being read
+    requests = lazy_import("requests")
+    from latency import new_trace_id
+    from debounce import PinDebouncer
+    import wire
+    import liveness
+    from log_setup import configure_logging
 
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
+    configure_logging("button_handler")
     logger = logging.getLogger(__name__)
 
 except ImportError as e:
     print(f"Error: Required modules not found - {e}")
-    print("Run: sudo apt-get install python3-rpi.gpio")
+    print("Run: pip install requests")
     exit(1)
 
+try:
+    import RPi.GPIO as GPIO
+except ImportError:
+    # Off the Pi a fake backend from fake_hardware is injected instead
+    GPIO = None
+
 LEFT_BUTTON_PIN = 4
 RIGHT_BUTTON_PIN = 5
-DEBOUNCE_TIME = 0.5
 RETRY_DELAY = 2
 FLASK_HOST = "localhost"
 FLASK_PORT = 5004
 FLASK_SERVER_URL = f"http://{FLASK_HOST}:{FLASK_PORT}"
 MAX_RETRIES = 3
+HEARTBEAT_INTERVAL = 10
+POLL_INTERVAL = 0.002  # Well inside the debounce window (debounce.DEBOUNCE_MS)
+PENDING_LIMIT = 5   # Presses held while the server is unreachable
+PENDING_TTL = 5.0   # Older held presses are stale and dropped
 
 class ButtonHandler:
-    def __init__(self):
-        self.last_left_press = 0
-        self.last_right_press = 0
+    def __init__(self, gpio=None, clock=None, server_url=None):
+        self.gpio = gpio or GPIO
+        self.clock = clock or time  # Anything with monotonic()/sleep(); simulations run faster
+        self.server_url = server_url or FLASK_SERVER_URL
+        self.running = True
+        self.buttons = {
+            LEFT_BUTTON_PIN: ("left", PinDebouncer()),
+            RIGHT_BUTTON_PIN: ("right", PinDebouncer()),
+        }
         self.server_available = False
         self.connection_attempts = 0
+        self.presses_sent = 0
+        self.pending = deque(maxlen=PENDING_LIMIT)
+        self.local = threading.local()  # requests.Session is not thread-safe: one per thread
         
     def setup_gpio(self):
         try:
-            GPIO.cleanup()
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setwarnings(False)
-            GPIO.setup(LEFT_BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-            GPIO.setup(RIGHT_BUTTON_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
+            gpio = self.gpio
+            gpio.cleanup()
+            gpio.setmode(gpio.BCM)
+            gpio.setwarnings(False)
+            gpio.setup(LEFT_BUTTON_PIN, gpio.IN, pull_up_down=gpio.PUD_UP)
+            gpio.setup(RIGHT_BUTTON_PIN, gpio.IN, pull_up_down=gpio.PUD_UP)
             logger.info("GPIO setup completed successfully")
             return True
         except Exception as e:
             logger.error(f"GPIO setup failed: {str(e)}")
             return False
 
+    def http(self):
+        """This thread's keep-alive session, so its requests reuse one connection"""
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
     def check_server_availability(self):
         try:
-            response = requests.get(f"{FLASK_SERVER_URL}/health", timeout=2)
+            response = self.http().get(f"{self.server_url}/health", timeout=2)
             if response.status_code == 200:
                 if not self.server_available:
                     logger.info("Server connection established")
@@ -63,75 +94,121 @@ class ButtonHandler:
             self.server_available = False
         return False
 
-    def send_button_press(self, choice):
+    def heartbeat_loop(self):
+        """Report liveness to the server without blocking the GPIO loop"""
+        while self.running:
+            try:
+                requests.post(
+                    f"{self.server_url}/heartbeat",
+                    json={"component": "button_handler"},
+                    timeout=2
+                )
+            except requests.exceptions.RequestException:
+                pass
+            self.clock.sleep(HEARTBEAT_INTERVAL)
+
+    def connect_loop(self):
+        """Find the server in the background and send presses held meanwhile"""
+        heartbeat_started = False
+        while self.running:
+            if not self.server_available and self.check_server_availability():
+                self.flush_pending()
+                if not heartbeat_started:
+                    threading.Thread(target=self.heartbeat_loop, daemon=True).start()
+                    heartbeat_started = True
+            self.clock.sleep(RETRY_DELAY)
+
+    def flush_pending(self):
+        while self.pending:
+            choice, trace_id, t_edge, gesture = self.pending.popleft()
+            if time.monotonic() - t_edge > PENDING_TTL:
+                logger.warning(f"Dropping stale {choice} press held while offline")
+                continue
+            self.send_button_press(choice, trace_id, t_edge, gesture)
+
+    def send_button_press(self, choice, trace_id=None, t_edge=None, gesture=wire.PRESS):
         if not self.server_available:
-            if self.check_server_availability():
-                logger.info("Server connection restored")
-            else:
-                logger.warning("Server unavailable - button press ignored")
-                return False
+            # The connector thread sends it once the server answers
+            self.pending.append((choice, trace_id or new_trace_id(), t_edge or time.monotonic(), gesture))
+            logger.warning("Server unavailable - button press held")
+            return True
 
         try:
-            response = requests.post(
-                f"{FLASK_SERVER_URL}/gpio-button-press",
-                json={"choice": choice},
+            response = self.http().post(
+                f"{self.server_url}/gpio-button-press",
+                json={
+                    "choice": choice,
+                    "gesture": gesture,
+                    "trace_id": trace_id or new_trace_id(),
+                    "t_edge": t_edge,
+                    "t_sent": time.monotonic()
+                },
                 headers={"Content-Type": "application/json"},
                 timeout=2
             )
+            if response.status_code == 429:
+                # Shed by the server's admission control; it is up, so don't go offline
+                logger.warning(f"Button press shed by server: {response.json().get('reason')}")
+                return False
             response.raise_for_status()
-            logger.info(f"Successfully sent button press: {choice}")
+            logger.info(f"Successfully sent button press: {choice}", extra={"category": "button"})
+            self.presses_sent += 1
             return True
-        except RequestException as e:
+        except requests.exceptions.RequestException as e:
             logger.error(f"Failed to send button press: {str(e)}")
             self.server_available = False
             return False
 
-    def check_button(self, pin, last_press_time, choice):
-        if GPIO.input(pin) == GPIO.LOW:
-            current_time = time.time()
-            if (current_time - last_press_time) >= DEBOUNCE_TIME:
-                logger.info(f"{choice.title()} button pressed")
-                if self.send_button_press(choice):
-                    return current_time
-        return last_press_time
+    def check_button(self, pin):
+        choice, debouncer = self.buttons[pin]
+        now = self.clock.monotonic()
+        fired = debouncer.update(self.gpio.input(pin) == self.gpio.LOW, now)
+        if fired:
+            gesture, edge = fired
+            # Trace from the first LOW read, not from the end of the debounce window
+            t_edge = time.monotonic() - (now - edge)
+            detail = "" if gesture == wire.PRESS else f" ({gesture})"
+            logger.info(f"{choice.title()} button pressed{detail}", extra={"category": "button"})
+            self.send_button_press(choice, new_trace_id(), t_edge, gesture)
 
     def run(self):
-        logger.info(f"Starting button handler... (Server URL: {FLASK_SERVER_URL})")
+        logger.info(f"Starting button handler... (Server URL: {self.server_url})")
         
         if not self.setup_gpio():
             logger.error("Failed to setup GPIO. Exiting...")
             return
 
-        logger.info("Checking server availability...")
-        self.check_server_availability()
+        # Read buttons right away; the server connection comes up in the background
+        threading.Thread(target=self.connect_loop, daemon=True).start()
+        log_ready("Button handler reading inputs")
 
         try:
-            while True:
-                if not self.server_available and (time.time() % 5) < 0.1:
-                    self.check_server_availability()
-
-                self.last_left_press = self.check_button(
-                    LEFT_BUTTON_PIN,
-                    self.last_left_press,
-                    "left"
-                )
-                
-                self.last_right_press = self.check_button(
-                    RIGHT_BUTTON_PIN,
-                    self.last_right_press,
-                    "right"
-                )
-                
-                time.sleep(0.1)
+            while self.running:
+                for pin in self.buttons:
+                    self.check_button(pin)
+                liveness.beat()
+                self.clock.sleep(POLL_INTERVAL)
 
         except KeyboardInterrupt:
             logger.info("\nButton handler stopped by user")
         except Exception as e:
             logger.error(f"\nError in button handler: {str(e)}")
         finally:
-            GPIO.cleanup()
+            self.gpio.cleanup()
             logger.info("GPIO cleanup completed")
 
+    def stop(self):
+        self.running = False
+
 if __name__ == "__main__":
-    handler = ButtonHandler()
+    gpio = GPIO
+    if gpio is None:
+        if os.environ.get("HARDWARE_BACKEND") != "sim":
+            print("Error: RPi.GPIO not found")
+            print("Run: sudo apt-get install python3-rpi.gpio (or set HARDWARE_BACKEND=sim)")
+            exit(1)
+        from fake_hardware import ScriptedGPIO
+        gpio = ScriptedGPIO.from_file(os.environ.get("SIM_SCRIPT"))
+
+    handler = ButtonHandler(gpio=gpio)
     handler.run()
@@ -0,0 +1,41 @@
+import sqlite3
+import logging
+
+logger = logging.getLogger(__name__)
+
+DATABASE = "database/quiz_data.db"
+
+
+def ensure_schema(conn):
+    """Create the UID -> question set registry written by card provisioning"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS card_registry (
+        uid TEXT PRIMARY KEY,
+        set_id INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        provisioned DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+
+def record_card(conn, uid, set_id, payload):
+    """Remember which set a verified card was written with (re-provisioning replaces it)"""
+    conn.execute(
+        """INSERT INTO card_registry (uid, set_id, payload) VALUES (?, ?, ?)
+           ON CONFLICT(uid) DO UPDATE SET set_id = excluded.set_id, payload = excluded.payload,
+                                          provisioned = CURRENT_TIMESTAMP""",
+        (uid, set_id, payload)
+    )
+
+
+def set_counts(conn):
+    """Provisioned cards per question set"""
+    return dict(conn.execute(
+        "SELECT set_id, COUNT(*) FROM card_registry GROUP BY set_id ORDER BY set_id"
+    ).fetchall())
+
+
+def connect(database=DATABASE):
+    conn = sqlite3.connect(database)
+    ensure_schema(conn)
+    return conn
@@ -0,0 +1,328 @@
+import sqlite3
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+
+DATABASE = "database/quiz_data.db"
+QUESTIONS_PER_QUIZ = 5
+
+QUESTIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS questions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    question TEXT NOT NULL,
+    left_choice TEXT NOT NULL,
+    right_choice TEXT NOT NULL,
+    set_id INTEGER NOT NULL CHECK(set_id > 0),
+    sort_key REAL NOT NULL DEFAULT 0,
+    version INTEGER NOT NULL DEFAULT 1
+)
+"""
+QUESTIONS_INDEX_SQL = (
+    "CREATE INDEX IF NOT EXISTS idx_questions_version_set_sort "
+    "ON questions (version, set_id, sort_key)"
+)
+VERSIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS question_versions (
+    version INTEGER PRIMARY KEY,
+    source TEXT,
+    created DATETIME DEFAULT CURRENT_TIMESTAMP,
+    published DATETIME
+)
+"""
+# Single-row pointer to the version new sessions are served from
+ACTIVE_VERSION_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS active_version (
+    id INTEGER PRIMARY KEY CHECK(id = 1),
+    version INTEGER NOT NULL
+)
+"""
+ACTIVE_VERSION_TTL = 1.0  # Seconds a cached active version is trusted
+# Uniform value in [0, 1) computed inside SQLite
+RANDOM_KEY_SQL = "(abs(random()) / 9223372036854775808.0)"
+
+_migrated = set()
+_migrate_lock = threading.Lock()
+_active_cache = {}  # database path -> (version, checked_at)
+
+
+def create_content_tables(cursor):
+    """Create the versioned question tables with version 1 active"""
+    cursor.execute(QUESTIONS_TABLE_SQL)
+    cursor.execute(QUESTIONS_INDEX_SQL)
+    cursor.execute(VERSIONS_TABLE_SQL)
+    cursor.execute(ACTIVE_VERSION_TABLE_SQL)
+    cursor.execute(
+        "INSERT OR IGNORE INTO question_versions (version, source, published) "
+        "VALUES (1, 'initial', CURRENT_TIMESTAMP)"
+    )
+    cursor.execute("INSERT OR IGNORE INTO active_version (id, version) VALUES (1, 1)")
+
+
+def migrate(conn):
+    """Bring an existing questions table up to the current schema.
+
+    Older databases limit set_id to (1, 2) and have no sort_key column;
+    SQLite cannot drop a CHECK constraint, so the table is rebuilt once.
+    Databases without content versions get their questions as version 1.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(questions)")]
+    if "sort_key" in columns and "version" not in columns:
+        conn.execute("ALTER TABLE questions ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        conn.execute("DROP INDEX IF EXISTS idx_questions_set_sort")
+    elif columns and "sort_key" not in columns:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DROP TABLE IF EXISTS questions_new")
+            conn.execute(QUESTIONS_TABLE_SQL.replace("questions (", "questions_new (", 1))
+            conn.execute(f"""
+                INSERT INTO questions_new (id, question, left_choice, right_choice, set_id, sort_key)
+                SELECT id, question, left_choice, right_choice, set_id, {RANDOM_KEY_SQL}
+                FROM questions
+            """)
+            conn.execute("DROP TABLE questions")
+            conn.execute("ALTER TABLE questions_new RENAME TO questions")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    create_content_tables(conn)
+    conn.commit()
+
+
+def ensure_migrated(conn):
+    """Run migrate() once per database file for this process"""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if path in _migrated:
+        return
+    with _migrate_lock:
+        if path not in _migrated:
+            migrate(conn)
+            _migrated.add(path)
+
+
+def active_version(conn):
+    """Version new sessions should use, re-read at most every ACTIVE_VERSION_TTL"""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    cached = _active_cache.get(path)
+    now = time.monotonic()
+    if cached and now - cached[1] < ACTIVE_VERSION_TTL:
+        return cached[0]
+    version = conn.execute("SELECT version FROM active_version WHERE id = 1").fetchone()[0]
+    _active_cache[path] = (version, now)
+    return version
+
+
+def select_questions(conn, set_id, count=QUESTIONS_PER_QUIZ, version=None):
+    """Pick `count` random questions from a set; returns (version, questions).
+
+    Every question carries a random sort_key, so a random start point plus
+    an index range scan on (version, set_id, sort_key) yields a random
+    window in O(log n + count), wrapping around at the end of the set. The
+    window is shuffled so questions don't always appear in the same
+    relative order. Sessions pass back the version they started with so a
+    publish mid-quiz doesn't change their content.
+    """
+    ensure_migrated(conn)
+    if version is None:
+        version = active_version(conn)
+    start = random.random()
+    query = """SELECT id, question, left_choice, right_choice
+               FROM questions
+               WHERE version = ? AND set_id = ? AND sort_key {op} ?
+               ORDER BY sort_key LIMIT ?"""
+    rows = conn.execute(query.format(op=">="), (version, set_id, start, count)).fetchall()
+    if len(rows) < count:
+        rows += conn.execute(query.format(op="<"), (version, set_id, start, count - len(rows))).fetchall()
+    questions = [dict(row) for row in rows]
+    random.shuffle(questions)
+    return version, questions
+
+
+def question_sets(conn, version=None):
+    """Set ids that have questions in a version (default: the active one)"""
+    ensure_migrated(conn)
+    if version is None:
+        version = active_version(conn)
+    return [row[0] for row in conn.execute(
+        "SELECT DISTINCT set_id FROM questions WHERE version = ? ORDER BY set_id", (version,)
+    )]
+
+
+def questions_by_id(conn, question_ids):
+    """Load questions in the given order, e.g. to resume a session"""
+    if not question_ids:
+        return []
+    placeholders = ",".join("?" * len(question_ids))
+    rows = conn.execute(
+        f"""SELECT id, question, left_choice, right_choice
+            FROM questions WHERE id IN ({placeholders})""",
+        tuple(question_ids)
+    ).fetchall()
+    by_id = {row[0]: dict(zip(("id", "question", "left_choice", "right_choice"), row)) for row in rows}
+    return [by_id[qid] for qid in question_ids if qid in by_id]
+
+
+def insert_questions(cursor, rows, version=1):
+    """Insert (question, left_choice, right_choice, set_id) tuples with fresh sort keys"""
+    cursor.executemany(
+        "INSERT INTO questions (question, left_choice, right_choice, set_id, sort_key, version) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        ((q, l, r, int(s), random.random(), version) for q, l, r, s in rows)
+    )
+
+
+def _normalize(item, default_set):
+    """Accept either left_choice/right_choice or a two-item options list"""
+    if "options" in item:
+        left, right = item["options"][:2]
+    else:
+        left, right = item["left_choice"], item["right_choice"]
+    set_id = item.get("set_id") or default_set
+    if not set_id:
+        raise ValueError(f"Question without set_id: {item.get('question')!r}")
+    return (item["question"].strip(), left.strip(), right.strip(), int(set_id))
+
+
+def read_bank(path, default_set=None):
+    """Read questions from a .json or .csv file"""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            items = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        items = data["questions"] if isinstance(data, dict) else data
+    return [_normalize(item, default_set) for item in items]
+
+
+def build_version(conn, rows, source=None, replace=False):
+    """Stage a new content version next to the live one.
+
+    The new version starts as a copy of the active version (minus the
+    imported sets when replacing) plus the imported rows, all in one
+    transaction. Nothing is served from it until publish().
+    """
+    migrate(conn)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        base = conn.execute("SELECT version FROM active_version WHERE id = 1").fetchone()[0]
+        version = conn.execute("SELECT MAX(version) FROM question_versions").fetchone()[0] + 1
+        conn.execute("INSERT INTO question_versions (version, source) VALUES (?, ?)", (version, source))
+
+        replaced = sorted({row[3] for row in rows}) if replace else []
+        placeholders = ",".join("?" * len(replaced)) or "NULL"
+        conn.execute(f"""
+            INSERT INTO questions (question, left_choice, right_choice, set_id, sort_key, version)
+            SELECT question, left_choice, right_choice, set_id, {RANDOM_KEY_SQL}, ?
+            FROM questions
+            WHERE version = ? AND set_id NOT IN ({placeholders})
+            ORDER BY id
+        """, (version, base, *replaced))
+        insert_questions(conn.cursor(), rows, version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return version
+
+
+def publish(conn, version):
+    """Point new sessions at `version` in one atomic update"""
+    with conn:
+        if not conn.execute("SELECT 1 FROM question_versions WHERE version = ?", (version,)).fetchone():
+            raise ValueError(f"Unknown question version {version}")
+        conn.execute("UPDATE active_version SET version = ? WHERE id = 1", (version,))
+        conn.execute(
+            "UPDATE question_versions SET published = CURRENT_TIMESTAMP WHERE version = ?",
+            (version,)
+        )
+    _active_cache.clear()
+
+
+def version_counts(conn, version):
+    return dict(conn.execute(
+        "SELECT set_id, COUNT(*) FROM questions WHERE version = ? GROUP BY set_id ORDER BY set_id",
+        (version,)
+    ).fetchall())
+
+
+def import_bank(path, database=DATABASE, default_set=None, replace=False, publish_now=True):
+    """Load a question bank as a new version; returns (version, per-set counts)"""
+    rows = read_bank(path, default_set)
+    conn = sqlite3.connect(database)
+    try:
+        version = build_version(conn, rows, source=os.path.basename(path), replace=replace)
+        if publish_now:
+            publish(conn, version)
+        return version, version_counts(conn, version)
+    finally:
+        conn.close()
+
+
+def reshuffle(database=DATABASE):
+    """Assign new random sort keys so windows don't repeat across visitors"""
+    conn = sqlite3.connect(database)
+    try:
+        with conn:
+            conn.execute(f"UPDATE questions SET sort_key = {RANDOM_KEY_SQL}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the quiz question bank")
+    parser.add_argument("--database", default=DATABASE)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    load = commands.add_parser("import", help="Bulk-load questions from JSON or CSV")
+    load.add_argument("path")
+    load.add_argument("--set-id", type=int, help="Set for rows that don't name one")
+    load.add_argument("--replace", action="store_true",
+                      help="Replace the imported sets instead of adding to them")
+    load.add_argument("--no-publish", action="store_true",
+                      help="Stage the new version without serving it")
+    release = commands.add_parser("publish", help="Serve a staged version to new sessions")
+    release.add_argument("version", type=int)
+    commands.add_parser("versions", help="List content versions")
+    commands.add_parser("reshuffle", help="Re-randomize question selection order")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        if not os.path.exists(args.path):
+            parser.error(f"{args.path} not found")
+        version, counts = import_bank(args.path, args.database, args.set_id,
+                                      args.replace, not args.no_publish)
+        state = "staged" if args.no_publish else "published"
+        print(f"✅ Question bank imported as version {version} ({state})")
+        for set_id, count in counts.items():
+            print(f"✅ Set {set_id} Questions: {count}")
+    elif args.command == "publish":
+        conn = sqlite3.connect(args.database)
+        try:
+            publish(conn, args.version)
+        except ValueError as e:
+            parser.error(str(e))
+        finally:
+            conn.close()
+        print(f"✅ Version {args.version} published")
+    elif args.command == "versions":
+        conn = sqlite3.connect(args.database)
+        try:
+            migrate(conn)
+            active = conn.execute("SELECT version FROM active_version WHERE id = 1").fetchone()[0]
+            for version, source, created, published in conn.execute(
+                "SELECT version, source, created, published FROM question_versions ORDER BY version"
+            ):
+                marker = "*" if version == active else " "
+                counts = version_counts(conn, version)
+                print(f"{marker} v{version}  {source or '-'}  created {created}  "
+                      f"published {published or '-'}  sets {counts}")
+        finally:
+            conn.close()
+    else:
+        reshuffle(args.database)
+        print("✅ Question order reshuffled")
@@ -0,0 +1,202 @@
+import sqlite3
+import os
+import csv
+import sys
+import time
+import tempfile
+import threading
+import logging
+import argparse
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATABASE = "database/quiz_data.db"
+SNAPSHOT_DIR = "database/snapshot"
+REFRESH_INTERVAL = int(os.environ.get("SNAPSHOT_INTERVAL", "60"))  # Max snapshot age in seconds
+EXPORT_COLUMNS = ("id", "session_id", "question_id", "choice", "timestamp")
+
+
+def snapshot_path(database=DATABASE, snapshot_dir=SNAPSHOT_DIR):
+    return os.path.join(snapshot_dir, os.path.basename(database))
+
+
+def take_snapshot(database=DATABASE, snapshot_dir=SNAPSHOT_DIR):
+    """Copy a consistent image of the live database with the online backup API.
+
+    The copy runs in one backup step inside a single read transaction;
+    the apps switch the database to WAL at startup (startup.warm_database),
+    so answer writes keep committing while it runs. It is written beside
+    the current snapshot and swapped in with os.replace; report connections
+    that are already open finish on the image they started with.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    target = snapshot_path(database, snapshot_dir)
+    fd, partial = tempfile.mkstemp(dir=snapshot_dir, suffix=".partial")
+    os.close(fd)
+    try:
+        source = sqlite3.connect(f"{Path(database).resolve().as_uri()}?mode=ro", uri=True)
+        dest = sqlite3.connect(partial)
+        try:
+            source.backup(dest)
+            # Readers only: no -wal/-shm files beside the snapshot
+            dest.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            dest.close()
+            source.close()
+        os.replace(partial, target)
+    except Exception:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return target
+
+
+def last_modified(database):
+    """Newest mtime of the database and its WAL, i.e. when it last took a write"""
+    stamps = [os.path.getmtime(path) for path in (database, f"{database}-wal") if os.path.exists(path)]
+    return max(stamps, default=0)
+
+
+class ReadReplica:
+    """Read-only connections to a snapshot that is at most `max_age` seconds stale.
+
+    Reporting, exports and ad-hoc analysis go through connect() so they never
+    hold locks on the live database the quiz writes to.
+    """
+
+    def __init__(self, database=DATABASE, snapshot_dir=None, max_age=REFRESH_INTERVAL):
+        self.database = database
+        self.snapshot_dir = snapshot_dir or os.path.join(os.path.dirname(database), "snapshot")
+        self.path = snapshot_path(database, self.snapshot_dir)
+        self.max_age = max_age
+        self.source_mtime = None  # last_modified() of the live database when the snapshot's copy started
+        self.lock = threading.Lock()
+
+    def age(self):
+        """Seconds since the snapshot was taken, or None if there is none yet"""
+        try:
+            return time.time() - os.path.getmtime(self.path)
+        except OSError:
+            return None
+
+    def refresh(self, force=False):
+        """Take a new snapshot if the current one is stale; returns True if one was taken"""
+        with self.lock:
+            age = self.age()
+            if not force and age is not None:
+                if age <= self.max_age:
+                    return False
+                # Compared with when the copy started, not finished: a commit landing
+                # during the copy is older than the snapshot file but not in it
+                if self.source_mtime is not None and last_modified(self.database) <= self.source_mtime:
+                    os.utime(self.path)  # Nothing written since; the snapshot is still current
+                    return False
+            start = time.perf_counter()
+            source_mtime = last_modified(self.database)
+            take_snapshot(self.database, self.snapshot_dir)
+            self.source_mtime = source_mtime
+            logger.info(f"Read snapshot refreshed in {(time.perf_counter() - start) * 1000:.0f} ms")
+            return True
+
+    def connect(self):
+        self.refresh()
+        conn = sqlite3.connect(f"{Path(self.path).resolve().as_uri()}?mode=ro", uri=True)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def start_refresher(self, interval=None):
+        """Keep the snapshot fresh from a daemon thread so reports rarely wait on a copy"""
+        interval = interval or self.max_age
+
+        def loop():
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Snapshot refresh failed: {str(e)}")
+                time.sleep(interval)
+
+        thread = threading.Thread(target=loop, name="snapshot", daemon=True)
+        thread.start()
+        return thread
+
+
+def choice_summary(conn):
+    """Answer counts per question and choice, live responses plus archived months"""
+    sources = ["SELECT question_id, choice, COUNT(*) AS count FROM responses GROUP BY question_id, choice"]
+    # response_aggregates only exists once retention has run (see retention.ensure_schema)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'response_aggregates'").fetchone():
+        sources.append("SELECT question_id, choice, count FROM response_aggregates")
+    rows = conn.execute(f"""
+        SELECT r.question_id, q.set_id, q.question, r.choice, SUM(r.count)
+        FROM ({" UNION ALL ".join(sources)}) AS r
+        LEFT JOIN questions q ON q.id = r.question_id
+        GROUP BY r.question_id, r.choice
+        ORDER BY r.question_id, r.choice
+    """).fetchall()
+    summary = {}
+    for question_id, set_id, question, choice, count in rows:
+        entry = summary.setdefault(question_id, {
+            "question_id": question_id, "set_id": set_id, "question": question, "choices": {}
+        })
+        entry["choices"][choice] = count
+    return list(summary.values())
+
+
+def export_responses(conn):
+    """CSV lines (header first) for every live response, oldest first"""
+    class Line:
+        def write(self, text):
+            return text
+
+    writer = csv.writer(Line())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in conn.execute(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM responses ORDER BY id"):
+        yield writer.writerow(row)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Reporting against a snapshot of the quiz database")
+    parser.add_argument("--database", default=DATABASE)
+    parser.add_argument("--max-age", type=int, default=REFRESH_INTERVAL,
+                        help="Refresh the snapshot first if it is older than this many seconds")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("snapshot", help="Take a fresh snapshot now")
+    commands.add_parser("summary", help="Answer counts per question and choice")
+    export = commands.add_parser("export", help="Write all responses as CSV")
+    export.add_argument("--out", help="Output file (default: stdout)")
+    query = commands.add_parser("query", help="Run a read-only SQL query")
+    query.add_argument("sql")
+    args = parser.parse_args()
+
+    replica = ReadReplica(args.database, max_age=args.max_age)
+    if args.command == "snapshot":
+        replica.refresh(force=True)
+        print(f"✅ Snapshot written to {replica.path}")
+        sys.exit(0)
+
+    conn = replica.connect()
+    try:
+        if args.command == "summary":
+            for entry in choice_summary(conn):
+                counts = ", ".join(f"{choice}: {count}" for choice, count in entry["choices"].items())
+                print(f"Q{entry['question_id']} (set {entry['set_id']}) {counts}  {entry['question'] or ''}")
+        elif args.command == "export":
+            out = open(args.out, "w", newline="") if args.out else sys.stdout
+            try:
+                out.writelines(export_responses(conn))
+            finally:
+                if args.out:
+                    out.close()
+        else:
+            cursor = conn.execute(args.sql)
+            print("\t".join(column[0] for column in cursor.description or ()))
+            for row in cursor:
+                print("\t".join(str(value) for value in row))
+    finally:
+        conn.close()
@@ -0,0 +1,165 @@
+import sqlite3
+import os
+import time
+import threading
+import logging
+import argparse
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Relative to this file, so the supervisor and cron runs agree with the apps on where files live
+DATABASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = os.path.join(DATABASE_DIR, "quiz_data.db")
+ARCHIVE_DIR = os.path.join(DATABASE_DIR, "archive")
+RETENTION_DAYS = 30
+OFF_PEAK_HOURS = (2, 5)  # Local hours [start, end) when maintenance may run
+CHECK_INTERVAL = 15 * 60
+VACUUM_PAGES = 256  # Free pages released per incremental vacuum step
+
+
+def ensure_schema(conn):
+    """Create the aggregate table that survives archival"""
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS response_aggregates (
+        month TEXT NOT NULL,
+        question_id INTEGER NOT NULL,
+        choice TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, question_id, choice)
+    )
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp)"
+    )
+
+
+def archive_path(month):
+    """Archive database file for a YYYY-MM month"""
+    return os.path.join(ARCHIVE_DIR, f"responses-{month}.db")
+
+
+def archive_old_responses(conn, retention_days=RETENTION_DAYS):
+    """Move responses older than the cutoff into per-month archive databases.
+
+    Each month is copied, rolled up into response_aggregates and deleted from
+    the live table inside a single transaction, so a crash never loses rows.
+    Returns the number of rows archived.
+    """
+    ensure_schema(conn)
+    cutoff = (datetime.utcnow() - timedelta(days=retention_days)).strftime('%Y-%m-%d %H:%M:%S')
+    months = [row[0] for row in conn.execute(
+        """SELECT DISTINCT strftime('%Y-%m', timestamp)
+           FROM responses WHERE timestamp < ?""",
+        (cutoff,)
+    )]
+    if not months:
+        return 0
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    archived = 0
+    for month in months:
+        conn.execute("ATTACH DATABASE ? AS archive", (archive_path(month),))
+        try:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS archive.responses (
+                id INTEGER PRIMARY KEY,
+                session_id TEXT NOT NULL,
+                question_id INTEGER NOT NULL,
+                choice TEXT NOT NULL,
+                timestamp DATETIME
+            )
+            """)
+            params = (month, cutoff)
+            with conn:
+                conn.execute("""
+                    INSERT OR IGNORE INTO archive.responses
+                        (id, session_id, question_id, choice, timestamp)
+                    SELECT id, session_id, question_id, choice, timestamp
+                    FROM responses
+                    WHERE strftime('%Y-%m', timestamp) = ? AND timestamp < ?
+                """, params)
+                conn.execute("""
+                    INSERT INTO response_aggregates (month, question_id, choice, count)
+                    SELECT strftime('%Y-%m', timestamp), question_id, choice, COUNT(*)
+                    FROM responses
+                    WHERE strftime('%Y-%m', timestamp) = ? AND timestamp < ?
+                    GROUP BY question_id, choice
+                    ON CONFLICT (month, question_id, choice)
+                    DO UPDATE SET count = count + excluded.count
+                """, params)
+                cursor = conn.execute("""
+                    DELETE FROM responses
+                    WHERE strftime('%Y-%m', timestamp) = ? AND timestamp < ?
+                """, params)
+                archived += cursor.rowcount
+            logger.info(f"Archived {cursor.rowcount} responses for {month}")
+        finally:
+            conn.execute("DETACH DATABASE archive")
+    return archived
+
+
+def compact(conn, pages=VACUUM_PAGES):
+    """Release free pages and truncate the WAL without a blocking full VACUUM"""
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if mode != 2:
+        # One-off conversion for databases created before incremental mode
+        logger.info("Enabling incremental auto_vacuum (one-time full VACUUM)")
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+    else:
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def is_off_peak(now=None):
+    """Check whether the local time falls inside the maintenance window"""
+    hour = (now or datetime.now()).hour
+    start, end = OFF_PEAK_HOURS
+    return start <= hour < end
+
+
+def run_retention(database=DATABASE, retention_days=RETENTION_DAYS):
+    """Archive old responses and compact the live database once"""
+    conn = sqlite3.connect(database)
+    try:
+        archived = archive_old_responses(conn, retention_days)
+        compact(conn)
+        logger.info(f"Retention run complete: {archived} responses archived")
+        return archived
+    finally:
+        conn.close()
+
+
+def start_maintenance_thread(database=DATABASE, retention_days=RETENTION_DAYS):
+    """Run retention in a daemon thread whenever the off-peak window is open"""
+    def loop():
+        last_run = None
+        while True:
+            today = datetime.now().date()
+            if is_off_peak() and last_run != today:
+                try:
+                    run_retention(database, retention_days)
+                    last_run = today
+                except Exception as e:
+                    logger.error(f"Retention run failed: {str(e)}")
+            time.sleep(CHECK_INTERVAL)
+
+    thread = threading.Thread(target=loop, name="retention", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    parser = argparse.ArgumentParser(description="Archive old quiz responses")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS,
+                        help="Keep responses newer than this many days")
+    parser.add_argument("--database", default=DATABASE)
+    args = parser.parse_args()
+
+    count = run_retention(args.database, args.days)
+    print(f"✅ Archived {count} responses older than {args.days} days")
@@ -1,26 +1,24 @@
 import sqlite3
 import os
+from question_bank import create_content_tables, insert_questions
 
 DATABASE = "database/quiz_data.db"
 
 def init_db():
-    # Delete old database if it exists
-    if os.path.exists(DATABASE):
-        os.remove(DATABASE)
+    # Delete old database (and its WAL files) if it exists
+    for path in (DATABASE, f"{DATABASE}-wal", f"{DATABASE}-shm"):
+        if os.path.exists(path):
+            os.remove(path)
 
     conn = sqlite3.connect(DATABASE)
     cursor = conn.cursor()
 
-    # Create questions table with set_id
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS questions (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        question TEXT NOT NULL,
-        left_choice TEXT NOT NULL,
-        right_choice TEXT NOT NULL,
-        set_id INTEGER NOT NULL CHECK(set_id IN (1,2))
-    )
-    """)
+    # Incremental auto_vacuum must be set before the first table is created
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode = WAL")
+
+    # Create versioned questions tables with a random selection key
+    create_content_tables(cursor)
 
     # Create responses table (Includes timestamps for tracking multiple attempts)
     cursor.execute("""
@@ -34,6 +32,18 @@ def init_db():
     )
     """)
 
+    # Monthly rollups kept after old responses are archived
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS response_aggregates (
+        month TEXT NOT NULL,
+        question_id INTEGER NOT NULL,
+        choice TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (month, question_id, choice)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_responses_timestamp ON responses (timestamp)")
+
     # Insert updated sample questions for both sets
     sample_questions = [
         # Question Set 1: App Permissions & Security
@@ -80,10 +90,7 @@ def init_db():
     ]
 
     # Insert questions into the database
-    cursor.executemany(
-        "INSERT INTO questions (question, left_choice, right_choice, set_id) VALUES (?, ?, ?, ?)",
-        sample_questions
-    )
+    insert_questions(cursor, sample_questions)
 
     # Check inserted questions
     cursor.execute("SELECT COUNT(*) FROM questions WHERE set_id = 1")
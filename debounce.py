@@ -0,0 +1,81 @@
+"""Per-pin button state machine for the GPIO daemon.
+
+Each pin moves through released -> pressing -> held -> releasing. A level
+change only counts once it has read the same for DEBOUNCE_MS, so contact
+bounce is absorbed in a few milliseconds instead of a fixed half-second
+lockout. A press fires once, on the confirmed press edge; holding the
+button never repeats it. Optional gestures:
+
+    BUTTON_LONG_PRESS_MS     also fire "long_press" once a press is held
+                             this long (0 = off, the default)
+    BUTTON_DOUBLE_PRESS_MS   report a press starting within this long of
+                             the previous one as "double_press" (0 = off)
+
+All times come from the caller's monotonic clock.
+"""
+import os
+
+import wire
+
+DEBOUNCE_MS = float(os.environ.get("BUTTON_DEBOUNCE_MS", "5"))
+LONG_PRESS_MS = float(os.environ.get("BUTTON_LONG_PRESS_MS", "0"))
+DOUBLE_PRESS_MS = float(os.environ.get("BUTTON_DOUBLE_PRESS_MS", "0"))
+
+RELEASED = "released"
+PRESSING = "pressing"
+HELD = "held"
+RELEASING = "releasing"
+
+
+class PinDebouncer:
+    __slots__ = ("debounce", "long_press", "double_press", "state", "since",
+                 "pressed_at", "last_press", "long_sent")
+
+    def __init__(self, debounce_ms=DEBOUNCE_MS, long_press_ms=LONG_PRESS_MS,
+                 double_press_ms=DOUBLE_PRESS_MS):
+        self.debounce = debounce_ms / 1000
+        self.long_press = long_press_ms / 1000
+        self.double_press = double_press_ms / 1000
+        self.state = RELEASED
+        self.since = None       # First read of the level change being confirmed
+        self.pressed_at = None  # Edge of the press being held
+        self.last_press = None  # Edge of the previous press, for double_press
+        self.long_sent = False
+
+    def update(self, pressed, now):
+        """Feed one read; returns (gesture, edge_time) when an event fires, else None"""
+        if self.state == RELEASED:
+            if not pressed:
+                return None
+            self.state, self.since = PRESSING, now
+
+        if self.state == PRESSING:
+            if not pressed:
+                self.state = RELEASED  # Glitch shorter than the debounce window
+                return None
+            if now - self.since < self.debounce:
+                return None
+            return self._pressed(self.since)
+
+        if self.state == HELD:
+            if pressed:
+                if self.long_press and not self.long_sent and now - self.pressed_at >= self.long_press:
+                    self.long_sent = True
+                    return wire.LONG_PRESS, self.pressed_at
+                return None
+            self.state, self.since = RELEASING, now
+
+        # RELEASING
+        if pressed:
+            self.state = HELD  # Bounce on release, still the same press
+        elif now - self.since >= self.debounce:
+            self.state = RELEASED
+        return None
+
+    def _pressed(self, edge):
+        self.state, self.pressed_at, self.long_sent = HELD, edge, False
+        if self.double_press and self.last_press is not None and edge - self.last_press <= self.double_press:
+            self.last_press = None  # A third press starts a new pair
+            return wire.DOUBLE_PRESS, edge
+        self.last_press = edge
+        return wire.PRESS, edge
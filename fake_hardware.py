@@ -0,0 +1,219 @@
+"""Hardware-free stand-ins for RPi.GPIO and nfcpy.
+
+ScriptedGPIO replays button presses from a script and VirtualNFCReader
+presents NDEF cards on a schedule (writable, so provisioning can run
+against it), both driven by a clock that can run
+faster than real time. They are injected into ButtonHandler/NFCHandler via
+their gpio=/reader_factory= arguments, or picked up by the daemons with
+HARDWARE_BACKEND=sim and an optional SIM_SCRIPT JSON file:
+
+    {"presses": [{"pin": 5, "at": 1.0, "hold": 0.15}],
+     "cards":   [{"at": 3.0, "payload": {"set_id": 2}}]}
+"""
+import json
+import time
+import random
+import threading
+
+
+class SimClock:
+    """Clock running `speed` times faster than real time"""
+
+    def __init__(self, speed=1.0):
+        self.speed = float(speed)
+        self.real_start = time.monotonic()
+        self.wall_start = time.time()
+
+    def elapsed(self):
+        return (time.monotonic() - self.real_start) * self.speed
+
+    def time(self):
+        return self.wall_start + self.elapsed()
+
+    def monotonic(self):
+        return self.real_start + self.elapsed()
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds / self.speed)
+
+
+def _load_script(path):
+    if not path:
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+class ScriptedGPIO:
+    """Drop-in for the subset of RPi.GPIO the button handler uses.
+
+    Presses are (pin, at, hold) in clock seconds from construction; the pin
+    reads LOW while a press is held and HIGH (pulled up) otherwise.
+    """
+
+    BCM = 11
+    IN = 1
+    PUD_UP = 22
+    LOW = 0
+    HIGH = 1
+
+    def __init__(self, presses=(), clock=None):
+        self.clock = clock or SimClock()
+        self.origin = self.clock.elapsed()
+        self.pins = {}
+        for pin, at, hold in sorted(presses, key=lambda p: p[1]):
+            self.pins.setdefault(pin, []).append((at, at + hold))
+        self.cursor = {pin: 0 for pin in self.pins}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, clock=None):
+        script = _load_script(path)
+        presses = [(p["pin"], p["at"], p.get("hold", 0.1)) for p in script.get("presses", [])]
+        return cls(presses, clock)
+
+    def setmode(self, mode):
+        pass
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, direction, pull_up_down=None):
+        self.pins.setdefault(pin, [])
+        self.cursor.setdefault(pin, 0)
+
+    def cleanup(self):
+        pass
+
+    def input(self, pin):
+        now = self.clock.elapsed() - self.origin
+        with self.lock:
+            intervals = self.pins.get(pin, [])
+            index = self.cursor.get(pin, 0)
+            # Time only moves forward, so finished presses are skipped for good
+            while index < len(intervals) and intervals[index][1] <= now:
+                index += 1
+            self.cursor[pin] = index
+            if index < len(intervals) and intervals[index][0] <= now:
+                return self.LOW
+        return self.HIGH
+
+    def finished(self):
+        """True once every scripted press has been released"""
+        now = self.clock.elapsed() - self.origin
+        return all(not ivs or ivs[-1][1] <= now for ivs in self.pins.values())
+
+
+class TextRecord:
+    """Stand-in for ndef.TextRecord"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+class _Ndef:
+    """NDEF area of a virtual tag with nfcpy's write/re-read behaviour"""
+
+    capacity = 137  # NTAG213
+
+    def __init__(self, records, corrupt=False):
+        self._cached = records   # What tag.ndef.records returns
+        self._stored = records   # What is actually on the card
+        self.corrupt = corrupt   # Writes are cut short, like a card pulled away mid-write
+        self.is_writeable = True
+
+    @property
+    def records(self):
+        return self._cached
+
+    @records.setter
+    def records(self, records):
+        self._cached = list(records)
+        texts = [r.text[:len(r.text) // 2] if self.corrupt else r.text for r in records]
+        self._stored = [TextRecord(text) for text in texts]
+
+    @property
+    def has_changed(self):
+        """Re-read the card; True if it differs from what was cached"""
+        changed = [r.text for r in self._stored] != [r.text for r in self._cached]
+        self._cached = self._stored
+        return changed
+
+
+class VirtualTag:
+    """Tag presented by the virtual reader; ndef is None for blank cards"""
+
+    def __init__(self, payload, uid=None, corrupt=False):
+        self.identifier = uid or b"\x04\x00\x00\x00\x00\x00\x00"
+        self.corrupt = corrupt
+        if payload is None:
+            self.ndef = None
+        else:
+            text = payload if isinstance(payload, str) else json.dumps(payload)
+            self.ndef = _Ndef([TextRecord(text)], corrupt)
+
+    def format(self):
+        """NDEF-format a blank card"""
+        if self.ndef is None:
+            self.ndef = _Ndef([], self.corrupt)
+        return True
+
+
+class VirtualNFCReader:
+    """Stand-in for nfc.ContactlessFrontend presenting scheduled cards.
+
+    Cards are (at, payload) in clock seconds from construction, where
+    payload is a dict (JSON-encoded into a text record), raw text, or None
+    for a card without NDEF data.
+    """
+
+    POLL = 0.05
+
+    def __init__(self, cards=(), clock=None, write_failures=0.0):
+        self.clock = clock or SimClock()
+        self.origin = self.clock.elapsed()
+        self.cards = sorted(cards, key=lambda c: c[0])
+        self.index = 0
+        self.presented = 0
+        self.write_failures = write_failures  # Fraction of cards whose writes get cut short
+        self.random = random.Random(0)
+
+    @classmethod
+    def from_file(cls, path, clock=None):
+        script = _load_script(path)
+        cards = [(c["at"], c.get("payload")) for c in script.get("cards", [])]
+        return cls(cards, clock)
+
+    @classmethod
+    def blank_cards(cls, count, interval=1.5, clock=None, write_failures=0.0):
+        """Blank cards tapped one after another, for provisioning runs"""
+        return cls([(i * interval, None) for i in range(1, count + 1)], clock, write_failures)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def close(self):
+        pass
+
+    def connect(self, rdwr=None, terminate=lambda: False):
+        """Block until the next card is due, then hand it to on-connect"""
+        while not terminate():
+            if self.index < len(self.cards):
+                at, payload = self.cards[self.index]
+                if self.clock.elapsed() - self.origin >= at:
+                    self.index += 1
+                    self.presented += 1
+                    corrupt = self.random.random() < self.write_failures
+                    tag = VirtualTag(payload, uid=self.index.to_bytes(7, "big"), corrupt=corrupt)
+                    if rdwr and "on-connect" in rdwr:
+                        rdwr["on-connect"](tag)
+                    return True
+            self.clock.sleep(self.POLL)
+        return False
+
+    def finished(self):
+        return self.index >= len(self.cards)
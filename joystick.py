@@ -0,0 +1,114 @@
+"""Server-side joystick channel for the Socket.IO app.
+
+Each Socket.IO client that sends `joystick_event` messages gets its own
+state: hover moves ({"type": "joystick", "direction": ...}) are coalesced
+to the latest direction and released through a per-client token bucket,
+so a jittery analog stick produces at most HOVER_RATE page updates a
+second. Selects ({"type": "select", "choice": ...}) are never coalesced;
+any pending hover goes out first so pages see the moves in order.
+
+Routed events are handed to `send` as wire events (see wire.py), which in
+the app publishes them to every client's buffer in broker.py.
+"""
+import time
+import threading
+
+import metrics
+import wire
+from ratelimit import TokenBucket
+
+HOVER_RATE = 10.0     # Hover updates per second per client
+HOVER_BURST = 3
+SELECT_RATE = 4.0     # Selects per second per client
+SELECT_BURST = 2
+FLUSH_INTERVAL = 0.05
+DIRECTIONS = ("left", "right")
+
+
+class JoystickClient:
+    __slots__ = ("client_id", "hover_bucket", "select_bucket", "pending", "current")
+
+    def __init__(self, client_id):
+        self.client_id = client_id
+        self.hover_bucket = TokenBucket(HOVER_RATE, HOVER_BURST)
+        self.select_bucket = TokenBucket(SELECT_RATE, SELECT_BURST)
+        self.pending = None   # Latest hover not yet sent
+        self.current = None   # Last hover sent
+
+
+class JoystickRouter:
+    def __init__(self, send):
+        self.send = send  # send(wire_event) broadcasts to the pages
+        self.clients = {}
+        self.lock = threading.Lock()
+
+    def connect(self, client_id):
+        with self.lock:
+            self.clients[client_id] = JoystickClient(client_id)
+        return client_id
+
+    def disconnect(self, client_id):
+        with self.lock:
+            self.clients.pop(client_id, None)
+
+    def _emit(self, code, direction, client_id):
+        self.send([code, wire.CHOICE_CODES[direction], client_id])
+        metrics.JOYSTICK_EVENTS.inc(outcome="sent")
+
+    def handle(self, client_id, data):
+        """Route one joystick_event; returns sent, coalesced, dropped or invalid"""
+        if not isinstance(data, dict):
+            metrics.JOYSTICK_EVENTS.inc(outcome="invalid")
+            return "invalid"
+        with self.lock:
+            client = self.clients.get(client_id) or JoystickClient(client_id)
+            self.clients[client_id] = client
+
+            if data.get("type") == "joystick" and data.get("direction") in DIRECTIONS:
+                return self._hover(client, data["direction"])
+            if data.get("type") == "select":
+                choice = data.get("choice") or client.pending or client.current
+                if choice in DIRECTIONS:
+                    return self._select(client, choice)
+        metrics.JOYSTICK_EVENTS.inc(outcome="invalid")
+        return "invalid"
+
+    def _hover(self, client, direction):
+        if direction == client.current and client.pending is None:
+            metrics.JOYSTICK_EVENTS.inc(outcome="coalesced")
+            return "coalesced"
+        if client.pending is None and client.hover_bucket.allow():
+            client.current = direction
+            self._emit(wire.HOVER, direction, client.client_id)
+            return "sent"
+        # Over the rate: keep only the latest direction for flush()
+        if client.pending is not None:
+            metrics.JOYSTICK_EVENTS.inc(outcome="coalesced")
+        client.pending = direction
+        return "coalesced"
+
+    def _select(self, client, choice):
+        if not client.select_bucket.allow():
+            metrics.JOYSTICK_EVENTS.inc(outcome="dropped")
+            return "dropped"
+        if client.pending is not None:
+            client.current, client.pending = client.pending, None
+            self._emit(wire.HOVER, client.current, client.client_id)
+        self._emit(wire.SELECT, choice, client.client_id)
+        return "sent"
+
+    def flush(self):
+        """Send coalesced hovers whose client has a token again"""
+        with self.lock:
+            for client in self.clients.values():
+                if client.pending is None or not client.hover_bucket.allow():
+                    continue
+                if client.pending != client.current:
+                    client.current = client.pending
+                    self._emit(wire.HOVER, client.current, client.client_id)
+                client.pending = None
+
+    def run(self, sleep=time.sleep):
+        while True:
+            self.flush()
+            sleep(FLUSH_INTERVAL)
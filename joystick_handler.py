@@ -77,15 +77,18 @@ class JoystickHandler {
                 console.log(`Client ID assigned: ${this.clientId}`);
             });
 
-            this.socket.on('gpio_event', (data) => {
-                console.log("Received GPIO event:", data);
-                
-                if (data.type === 'joystick' && data.direction) {
-                    this.handleJoystickMove(data.direction.toLowerCase());
-                } 
-                else if (data.type === 'select') {
-                    this.handleSelect(data.choice);
-                }
+            // Routed joystick events arrive as wire frames (see wire.py):
+            // [sent_ms, ["j"|"s", "l"|"r", client_id], ...]
+            this.socket.on('e', (frame) => {
+                const [, ...events] = JSON.parse(frame);
+                events.forEach(([code, side]) => {
+                    const direction = side === 'l' ? 'left' : 'right';
+                    if (code === 'j') {
+                        this.handleJoystickMove(direction);
+                    } else if (code === 's') {
+                        this.handleSelect(direction);
+                    }
+                });
             });
 
             this.socket.on('error', (error) => {
@@ -0,0 +1,137 @@
+"""Per-hop input latency tracing from button edge to browser render.
+
+Hops (all in milliseconds):
+    edge_to_send     button edge detected -> HTTP post sent (button daemon)
+    send_to_server   HTTP post sent -> gpio_button_press() entered
+    queue_wait       event queued -> picked up by an SSE generator
+    sse_to_browser   SSE frame written -> EventSource.onmessage fired
+    browser_render   onmessage -> next frame painted after handling
+    end_to_end       button edge -> browser render
+
+Daemon and server share CLOCK_MONOTONIC on the Pi, so their stamps are
+compared directly. The browser reports wall-clock milliseconds, which are
+compared against the wall-clock stamp wire.py puts on each frame.
+"""
+import math
+import time
+import uuid
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+HOPS = ("edge_to_send", "send_to_server", "queue_wait",
+        "sse_to_browser", "browser_render", "end_to_end")
+MAX_OPEN_TRACES = 512
+
+
+def is_stamp(value):
+    """A usable timestamp: a finite int or float (JSON true/false are bools, not stamps)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def new_trace_id():
+    """Short random id carried by one button press through every hop"""
+    return uuid.uuid4().hex[:12]
+
+
+class Histogram:
+    """Fixed-bucket histogram of millisecond samples"""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value_ms):
+        self.counts[bisect_left(self.buckets, value_ms)] += 1
+        self.total += value_ms
+        self.count += 1
+        self.max = max(self.max, value_ms)
+
+    def to_dict(self):
+        labels = [f"le_{b}" for b in self.buckets] + ["le_inf"]
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class LatencyTracker:
+    """Collects hop timings and joins server and browser halves of a trace"""
+
+    def __init__(self):
+        self.histograms = {hop: Histogram() for hop in HOPS}
+        self.traces = OrderedDict()  # trace_id -> server-side stamps
+        self.lock = threading.Lock()
+
+    def observe(self, hop, seconds):
+        if seconds < 0:
+            return
+        with self.lock:
+            self.histograms[hop].observe(seconds * 1000.0)
+
+    def button_press(self, payload):
+        """Start a trace for an incoming press; returns the queued event"""
+        received = time.monotonic()
+        trace_id = payload.get("trace_id") or new_trace_id()
+        # A malformed stamp only costs its hops; the press itself still goes out
+        edge = payload.get("t_edge") if is_stamp(payload.get("t_edge")) else None
+        sent = payload.get("t_sent") if is_stamp(payload.get("t_sent")) else None
+        if edge is not None and sent is not None:
+            self.observe("edge_to_send", sent - edge)
+        if sent is not None:
+            self.observe("send_to_server", received - sent)
+
+        with self.lock:
+            self.traces[trace_id] = {"t_edge": edge, "t_queued": received}
+            while len(self.traces) > MAX_OPEN_TRACES:
+                self.traces.popitem(last=False)
+        return {"choice": payload["choice"], "trace_id": trace_id}
+
+    def dequeued(self, event):
+        """Stamp an event as it leaves the queue; the frame it goes out in carries sent_ms"""
+        now = time.monotonic()
+        with self.lock:
+            trace = self.traces.get(event["trace_id"])
+            if trace is not None:
+                trace["t_streamed"] = now
+        if trace is not None:
+            self.observe("queue_wait", now - trace["t_queued"])
+        return event
+
+    def browser_report(self, report):
+        """Record the browser half of a trace reported back to the server.
+
+        Returns False, recording nothing, if the trace_id or a stamp is malformed.
+        """
+        if not isinstance(report.get("trace_id"), str):
+            return False
+        sent = report.get("sent_ms")
+        received = report.get("received_ms")
+        rendered = report.get("rendered_ms")
+        if any(stamp is not None and not is_stamp(stamp) for stamp in (sent, received, rendered)):
+            return False
+        if sent is not None and received is not None:
+            self.observe("sse_to_browser", (received - sent) / 1000.0)
+        if received is not None and rendered is not None:
+            self.observe("browser_render", (rendered - received) / 1000.0)
+
+        with self.lock:
+            trace = self.traces.pop(report.get("trace_id"), None)
+        if trace and trace.get("t_edge") is not None and "t_streamed" in trace \
+                and sent is not None and rendered is not None:
+            server_part = trace["t_streamed"] - trace["t_edge"]
+            self.observe("end_to_end", server_part + (rendered - sent) / 1000.0)
+        return True
+
+    def snapshot(self):
+        with self.lock:
+            return {hop: h.to_dict() for hop, h in self.histograms.items()}
+
+
+tracker = LatencyTracker()
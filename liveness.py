@@ -0,0 +1,72 @@
+"""Liveness heartbeats from supervised components to supervisor.py.
+
+The supervisor starts each component with SUPERVISOR_ADDR (host:port of
+its local UDP socket) and SUPERVISOR_COMPONENT in the environment. beat()
+sends one "<component> <pid>" datagram at most every BEAT_INTERVAL and is
+a no-op when the component was started by hand, so it is cheap to call
+from a poll loop. A loop that stops calling it, for example because it is
+stuck, stops beating and is restarted.
+"""
+import os
+import time
+import socket
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SUPERVISOR_ADDR = os.environ.get("SUPERVISOR_ADDR", "")
+COMPONENT = os.environ.get("SUPERVISOR_COMPONENT", "")
+BEAT_INTERVAL = 0.5
+
+_address = None
+_socket = None
+_last_beat = 0.0
+if SUPERVISOR_ADDR and COMPONENT:
+    host, _, port = SUPERVISOR_ADDR.rpartition(":")
+    _address = (host or "127.0.0.1", int(port))
+    _socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+
+def enabled():
+    return _socket is not None
+
+
+def beat():
+    """Tell the supervisor this component is alive (rate limited to BEAT_INTERVAL)"""
+    global _last_beat
+    if _socket is None:
+        return
+    now = time.monotonic()
+    if now - _last_beat < BEAT_INTERVAL:
+        return
+    _last_beat = now
+    try:
+        _socket.sendto(f"{COMPONENT} {os.getpid()}".encode(), _address)
+    except OSError:
+        pass  # A missing supervisor is not the component's problem
+
+
+def start_probe(url, interval=BEAT_INTERVAL, timeout=2):
+    """Beat from a daemon thread for as long as GET `url` answers 200.
+
+    Used by the app, whose request threads have no loop to beat from:
+    a wedged server stops answering its own health check and stops beating.
+    """
+    if _socket is None:
+        return None
+    import urllib.request
+
+    def loop():
+        while True:
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    if response.status == 200:
+                        beat()
+            except Exception as e:
+                logger.debug(f"Liveness probe failed: {str(e)}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="liveness", daemon=True)
+    thread.start()
+    return thread
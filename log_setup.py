@@ -0,0 +1,162 @@
+"""Logging configuration shared by the apps and hardware daemons.
+
+LOG_MODE=basic (default) keeps the plain console format. LOG_MODE=async
+routes every record through a QueueHandler so callers only pay for an
+in-memory enqueue; a QueueListener thread writes JSON lines to a
+size-rotated file. High-frequency categories are rate limited before they
+reach the queue, and verbose tracing can be toggled at runtime with
+set_verbose(), SIGUSR1 or the apps' /debug/logging endpoint.
+"""
+import os
+import json
+import atexit
+import queue
+import signal
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from ratelimit import TokenBucket
+
+LOG_MODE = os.environ.get("LOG_MODE", "basic")
+LOG_DIR = os.environ.get("LOG_DIR", "logs")
+LOG_MAX_BYTES = 1024 * 1024
+LOG_BACKUP_COUNT = 3
+BASIC_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# Records per second allowed for each high-frequency category
+CATEGORY_RATES = {
+    "button": 5,
+    "heartbeat": 0.1,
+    "engineio": 2,
+    "ingress": 1,
+}
+# Categories only written while verbose tracing is on
+VERBOSE_CATEGORIES = {"engineio"}
+# Loggers whose records belong to a category without passing extra=
+LOGGER_CATEGORIES = {
+    "engineio": "engineio",
+    "socketio": "engineio",
+}
+
+_verbose = threading.Event()
+_listener = None
+
+
+def category_of(record):
+    category = getattr(record, "category", None)
+    if category:
+        return category
+    return LOGGER_CATEGORIES.get(record.name.split(".", 1)[0])
+
+
+def is_verbose():
+    return _verbose.is_set()
+
+
+def set_verbose(enabled):
+    """Switch verbose tracing on or off without restarting"""
+    if enabled:
+        _verbose.set()
+    else:
+        _verbose.clear()
+    logging.getLogger(__name__).warning(f"Verbose logging {'enabled' if enabled else 'disabled'}")
+
+
+class SamplingFilter(logging.Filter):
+    """Drop DEBUG/verbose-only records unless tracing is on, and rate limit
+    high-frequency categories. Suppressed counts are attached to the next
+    record of the same category that gets through."""
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.buckets = {name: TokenBucket(rate, max(rate, 1)) for name, rate in (rates or CATEGORY_RATES).items()}
+        self.suppressed = {name: 0 for name in self.buckets}
+
+    def filter(self, record):
+        verbose = _verbose.is_set()
+        if record.levelno < logging.INFO and not verbose:
+            return False
+        category = category_of(record)
+        if category in VERBOSE_CATEGORIES and not verbose and record.levelno < logging.WARNING:
+            return False
+
+        bucket = self.buckets.get(category)
+        if bucket is None or record.levelno >= logging.WARNING:
+            return True
+        if not bucket.allow():
+            self.suppressed[category] += 1
+            return False
+        if self.suppressed[category]:
+            record.suppressed = self.suppressed[category]
+            self.suppressed[category] = 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    FIELDS = ("category", "suppressed", "trace_id", "session_id")
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(component, mode=None):
+    """Configure the root logger for a process; returns the root logger"""
+    global _listener
+    mode = mode or LOG_MODE
+    root = logging.getLogger()
+
+    if mode != "async":
+        logging.basicConfig(level=logging.INFO, format=BASIC_FORMAT)
+        return root
+
+    if _listener is not None:
+        return root
+
+    os.makedirs(LOG_DIR, exist_ok=True)
+    file_handler = RotatingFileHandler(
+        os.path.join(LOG_DIR, f"{component}.log"),
+        maxBytes=LOG_MAX_BYTES,
+        backupCount=LOG_BACKUP_COUNT
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    records = queue.SimpleQueue()
+    queue_handler = QueueHandler(records)
+    queue_handler.addFilter(SamplingFilter())
+
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    # DEBUG reaches the filter so tracing can be switched on live
+    root.setLevel(logging.DEBUG)
+
+    _listener = QueueListener(records, file_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+    if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGUSR1, lambda signum, frame: set_verbose(not is_verbose()))
+    return root
+
+
+def stop_logging():
+    """Flush and stop the background writer"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,226 @@
+"""Low-overhead metrics registry with Prometheus text export.
+
+Metrics are created once at import time and updated in place under a
+per-metric lock. Label values are limited to bounded sets (Flask endpoint
+names, component names, fixed operation names), so the cost of recording
+and of rendering /metrics stays constant as traffic grows.
+"""
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+PREFIX = "privacy_pac_"
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = PREFIX + name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=()):
+        super().__init__(name, help_text, labels)
+        self.values = {}
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+        self.values = {}  # key -> [bucket counts..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * (len(self.buckets) + 3)
+            row[index] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self.lock:
+            items = [(k, list(v)) for k, v in self.values.items()]
+        lines = []
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, ("le", bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {row[-2]}")
+            lines.append(f"{self.name}_count{labels} {row[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def register(self, metric):
+        with self.lock:
+            self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self.register(Counter(name, help_text, labels))
+
+    def gauge(self, name, help_text, labels=()):
+        return self.register(Gauge(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_text, labels, buckets))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by endpoint, method and status",
+    ("endpoint", "method", "status"))
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP handler latency by endpoint", ("endpoint",))
+EVENTS_QUEUED = registry.counter(
+    "events_queued_total", "Events accepted into an event queue", ("queue",))
+EVENTS_DROPPED = registry.counter(
+    "events_dropped_total", "Events dropped because a queue was full", ("queue",))
+QUEUE_DEPTH = registry.gauge(
+    "event_queue_depth", "Events waiting in a queue", ("queue",))
+INGRESS_SHED = registry.counter(
+    "ingress_shed_total", "Incoming events shed by admission control", ("endpoint", "reason"))
+SLOW_CONSUMER_DISCONNECTS = registry.counter(
+    "slow_consumer_disconnects_total", "Stream subscribers closed for falling behind",
+    ("stream", "reason"))
+SSE_CLIENTS = registry.gauge(
+    "sse_clients", "Open Server-Sent Events streams", ("stream",))
+SOCKETIO_CLIENTS = registry.gauge(
+    "socketio_clients", "Connected Socket.IO clients")
+DB_QUERY = registry.histogram(
+    "db_query_duration_seconds", "SQLite statement latency", ("operation",))
+DB_COMMIT = registry.histogram(
+    "db_commit_duration_seconds", "SQLite commit latency")
+JOYSTICK_EVENTS = registry.counter(
+    "joystick_events_total", "Joystick events by outcome (sent, coalesced, dropped, invalid)",
+    ("outcome",))
+HEARTBEATS = registry.counter(
+    "daemon_heartbeats_total", "Heartbeats received from hardware daemons", ("component",))
+LAST_HEARTBEAT = registry.gauge(
+    "daemon_last_heartbeat_timestamp_seconds", "Unix time of the last heartbeat", ("component",))
+HEARTBEAT_COMPONENTS = ("button_handler", "nfc_handler")
+
+
+def record_heartbeat(component):
+    """Record a daemon heartbeat; unknown components are ignored to bound labels"""
+    if component not in HEARTBEAT_COMPONENTS:
+        return False
+    HEARTBEATS.inc(component=component)
+    LAST_HEARTBEAT.set(time.time(), component=component)
+    return True
+
+
+def instrument_app(app):
+    """Count and time every Flask request by endpoint name"""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        start = getattr(g, "_metrics_start", None)
+        endpoint = request.endpoint or "unmatched"
+        if start is not None:
+            HTTP_LATENCY.observe(time.perf_counter() - start, endpoint=endpoint)
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method,
+                          status=response.status_code)
+        return response
+
+    return app
@@ -1,44 +1,90 @@
 try:
-    import nfc
-    import socketio
+    import os
     import logging
     import json
     import time
+    import argparse
+    import threading
+    from collections import deque
     from datetime import datetime
+    from startup import lazy_import, log_ready
+    # Loaded on the connector thread, after the reader is already polling
+    try:
+        socketio = lazy_import("socketio")
+    except ImportError:
+        print("Error: python-socketio not found")
+        print("Run: pip install python-socketio")
+        exit(1)
+    from log_setup import configure_logging
+    import liveness
+    from database.cards import connect as connect_registry, record_card
 
     # Configure logging
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
+    configure_logging("nfc_handler")
     logger = logging.getLogger(__name__)
 
 except ImportError as e:
-    print(f"Error: Required modules not found - {e}")
-    print("Run: pip install nfcpy python-socketio")
+    # Everything above is the standard library or this repository
+    print(f"Error: Required module not found - {e.name or e}")
+    print("Run it from the repository root: python nfc-handler.py")
     exit(1)
 
+try:
+    import nfc
+    import ndef  # ndeflib, installed with nfcpy
+except ImportError:
+    # Off the Pi a virtual reader from fake_hardware is injected instead
+    nfc = None
+    ndef = None
+
 # Configuration
 SOCKET_URL = "http://localhost:5004"
 RETRY_DELAY = 2
 MAX_RETRIES = 3
+HEARTBEAT_INTERVAL = 10
+PENDING_LIMIT = 5   # Cards held until the first connection
+PENDING_TTL = 10.0  # Older held cards are stale and dropped
+DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database/quiz_data.db")
+
+def usb_reader():
+    """Open the USB contactless frontend"""
+    return nfc.ContactlessFrontend('usb')
+
+def card_payload(set_id):
+    """Smallest card text on_connect accepts; a shorter NDEF message reads in fewer commands"""
+    return json.dumps({"set_id": set_id}, separators=(",", ":"))
+
+def text_record(text):
+    if ndef is not None:
+        return ndef.TextRecord(text)
+    from fake_hardware import TextRecord
+    return TextRecord(text)
 
 class NFCHandler:
-    def __init__(self):
+    def __init__(self, reader_factory=None, clock=None, server_url=None):
+        self.reader_factory = reader_factory or usb_reader
+        self.clock = clock or time  # Anything with sleep(); simulations run faster
+        self.server_url = server_url or SOCKET_URL
+        self.running = True
         self.socket_connected = False
         self.connection_attempts = 0
-        
-        # Initialize SocketIO client
+        self.cards_sent = 0
+        self.pending = deque(maxlen=PENDING_LIMIT)
+        self.pending_lock = threading.Lock()
+        # Created by the connector thread so the reader starts without socketio loaded
+        self.sio = None
+
+    def create_client(self):
+        """Build the SocketIO client and its event handlers"""
         self.sio = socketio.Client(
-            logger=True,
-            engineio_logger=True,
+            # Packet tracing goes through log_setup sampling/verbose toggle
+            logger=logging.getLogger("socketio.client"),
+            engineio_logger=logging.getLogger("engineio.client"),
             reconnection=True,
             reconnection_attempts=0,  # Infinite reconnection attempts
             reconnection_delay=1,
             reconnection_delay_max=5
         )
-        
-        # Set up Socket.IO event handlers
         self.setup_socket_events()
 
     def setup_socket_events(self):
@@ -48,6 +94,7 @@ class NFCHandler:
             self.socket_connected = True
             self.connection_attempts = 0
             logger.info("Connected to server")
+            self.flush_pending()
 
         @self.sio.event
         def connect_error(data):
@@ -64,7 +111,7 @@ class NFCHandler:
         """Connect to Socket.IO server"""
         if not self.socket_connected:
             try:
-                self.sio.connect(SOCKET_URL)
+                self.sio.connect(self.server_url)
                 logger.info("Socket.IO connection established")
                 return True
             except Exception as e:
@@ -72,6 +119,45 @@ class NFCHandler:
                 return False
         return True
 
+    def connect_loop(self):
+        """Connect in the background; the client reconnects by itself afterwards"""
+        if self.sio is None:
+            self.create_client()
+        while self.running and not self.connect_socket():
+            self.clock.sleep(RETRY_DELAY)
+        if self.running:
+            self.heartbeat_loop()
+
+    def flush_pending(self):
+        with self.pending_lock:
+            held = list(self.pending)
+            self.pending.clear()
+        for data, read_at in held:
+            if time.monotonic() - read_at > PENDING_TTL:
+                logger.warning(f"Dropping stale card read while offline: {data}")
+                continue
+            self.send_card(data)
+
+    def send_card(self, data):
+        if self.socket_connected:
+            self.sio.emit('card_detected', data)
+            self.cards_sent += 1
+            logger.info(f"Card data sent: {data}")
+        else:
+            with self.pending_lock:
+                self.pending.append((data, time.monotonic()))
+            logger.warning("Socket not connected - card data held")
+
+    def heartbeat_loop(self):
+        """Report liveness to the server while the reader loop runs"""
+        while self.running:
+            if self.socket_connected:
+                try:
+                    self.sio.emit('heartbeat', {'component': 'nfc_handler'})
+                except Exception as e:
+                    logger.warning(f"Heartbeat failed: {str(e)}")
+            self.clock.sleep(HEARTBEAT_INTERVAL)
+
     def on_connect(self, tag):
         """Handle NFC tag connection"""
         try:
@@ -90,11 +176,7 @@ class NFCHandler:
                         continue
 
                     # Send card detection event
-                    if self.socket_connected:
-                        self.sio.emit('card_detected', data)
-                        logger.info(f"Card data sent: {data}")
-                    else:
-                        logger.warning("Socket not connected - card data not sent")
+                    self.send_card(data)
 
                 except json.JSONDecodeError:
                     logger.error("Invalid JSON data on card")
@@ -109,20 +191,24 @@ class NFCHandler:
 
     def run(self):
         """Main loop"""
-        logger.info(f"Starting NFC handler... (Server URL: {SOCKET_URL})")
+        logger.info(f"Starting NFC handler... (Server URL: {self.server_url})")
         
-        # Connect to Socket.IO server
-        self.connect_socket()
+        # Poll the reader right away; the server connection comes up in the background
+        threading.Thread(target=self.connect_loop, daemon=True).start()
 
         try:
             # Initialize NFC reader
-            with nfc.ContactlessReader('usb') as clf:
+            with self.reader_factory() as clf:
                 logger.info("NFC reader initialized")
+                log_ready("NFC handler polling reader")
                 
-                while True:
+                while self.running:
                     # Poll for NFC tags
-                    clf.connect(rdwr={'on-connect': self.on_connect})
-                    time.sleep(0.1)
+                    clf.connect(
+                        rdwr={'on-connect': self.on_connect},
+                        terminate=self.should_stop
+                    )
+                    self.clock.sleep(0.1)
 
         except KeyboardInterrupt:
             logger.info("\nNFC handler stopped by user")
@@ -133,9 +219,154 @@ class NFCHandler:
                 self.sio.disconnect()
             logger.info("Cleanup completed")
 
+    def should_stop(self):
+        """Polled by the reader while it waits for a card, so a stuck reader stops beating"""
+        liveness.beat()
+        return not self.running
+
+    def stop(self):
+        self.running = False
+
+class CardProvisioner:
+    """Write, read back and register quiz cards as they are tapped one after another"""
+
+    def __init__(self, set_id, conn, reader_factory=None, clock=None, count=None, overwrite=False):
+        self.set_id = set_id
+        self.payload = card_payload(set_id)
+        self.conn = conn
+        self.reader_factory = reader_factory or usb_reader
+        self.clock = clock or time
+        self.count = count
+        self.overwrite = overwrite
+        self.running = True
+        self.written = 0
+        self.failed = 0
+        self.skipped = 0
+        self.first_ok = None
+        self.last_ok = None
+
+    def current_text(self, tag):
+        records = tag.ndef.records if tag.ndef else []
+        return records[0].text if len(records) == 1 and hasattr(records[0], "text") else None
+
+    def provision(self, tag):
+        """Returns "written", "unchanged", "skipped" or "failed" for one tapped card"""
+        uid = tag.identifier.hex()
+        if tag.ndef is None and not tag.format():
+            logger.error(f"Card {uid} could not be NDEF formatted")
+            return "failed"
+        if not tag.ndef.is_writeable:
+            logger.error(f"Card {uid} is read-only")
+            return "failed"
+
+        current = self.current_text(tag)
+        if current == self.payload:
+            result = "unchanged"
+        else:
+            if current and not self.overwrite:
+                try:
+                    if "set_id" in json.loads(current):
+                        logger.warning(f"Card {uid} already holds {current}; use --overwrite to rewrite it")
+                        return "skipped"
+                except (ValueError, TypeError):
+                    pass
+            tag.ndef.records = [text_record(self.payload)]
+            result = "written"
+
+        # nfcpy caches what it wrote; has_changed re-reads the card itself
+        tag.ndef.has_changed
+        if self.current_text(tag) != self.payload:
+            logger.error(f"Card {uid} failed verification (read back {self.current_text(tag)!r}); tap it again")
+            return "failed"
+
+        record_card(self.conn, uid, self.set_id, self.payload)
+        self.conn.commit()
+        return result
+
+    def on_connect(self, tag):
+        try:
+            result = self.provision(tag)
+        except Exception as e:
+            logger.error(f"Error provisioning card: {str(e)}")
+            result = "failed"
+
+        if result == "failed":
+            self.failed += 1
+        elif result == "skipped":
+            self.skipped += 1
+        else:
+            self.written += 1
+            self.last_ok = time.monotonic()
+            self.first_ok = self.first_ok or self.last_ok
+            print(f"✅ Card {self.written} {tag.identifier.hex()} -> set {self.set_id} "
+                  f"({result}, {self.rate():.1f} cards/min)")
+        if self.count and self.written >= self.count:
+            self.running = False
+        return True  # Wait for the card to be removed before the next one
+
+    def rate(self):
+        """Verified cards per minute, first to latest"""
+        if self.written < 2 or self.last_ok <= self.first_ok:
+            return 0.0
+        return (self.written - 1) / (self.last_ok - self.first_ok) * 60
+
+    def run(self):
+        logger.info(f"Provisioning cards for set {self.set_id} with payload {self.payload}")
+        try:
+            with self.reader_factory() as clf:
+                print(f"Tap cards to write set {self.set_id} (Ctrl-C to stop)")
+                # The virtual reader runs out of scripted cards; a real one never does
+                exhausted = getattr(clf, "finished", lambda: False)
+                while self.running:
+                    if not clf.connect(
+                        rdwr={'on-connect': self.on_connect},
+                        terminate=lambda: not self.running or exhausted()
+                    ):
+                        break
+        except KeyboardInterrupt:
+            pass
+        print(f"Provisioned {self.written} cards for set {self.set_id} "
+              f"({self.failed} failed, {self.skipped} skipped, {self.rate():.1f} cards/min)")
+
+    def stop(self):
+        self.running = False
+
 if __name__ == "__main__":
-    logger.info(f"Starting Privacy-Pac NFC Handler (UTC: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})")
-    logger.info(f"Current user: recker1103")
-    
-    handler = NFCHandler()
-    handler.run()
+    parser = argparse.ArgumentParser(description="Privacy-Pac NFC handler")
+    commands = parser.add_subparsers(dest="command")
+    provision = commands.add_parser("provision", help="Write and verify quiz cards in a tap-tap-tap loop")
+    provision.add_argument("--set-id", type=int, required=True)
+    provision.add_argument("--count", type=int, help="Stop after this many verified cards")
+    provision.add_argument("--overwrite", action="store_true",
+                           help="Rewrite cards that already carry another set")
+    provision.add_argument("--database", default=DATABASE)
+    provision.add_argument("--sim-cards", type=int, default=20,
+                           help="Blank cards the simulated reader presents (HARDWARE_BACKEND=sim)")
+    args = parser.parse_args()
+
+    if args.command != "provision":
+        logger.info(f"Starting Privacy-Pac NFC Handler (UTC: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})")
+        logger.info(f"Current user: recker1103")
+
+    reader_factory = None
+    if nfc is None:
+        if os.environ.get("HARDWARE_BACKEND") != "sim":
+            print("Error: nfcpy not found")
+            print("Run: pip install nfcpy (or set HARDWARE_BACKEND=sim)")
+            exit(1)
+        from fake_hardware import VirtualNFCReader
+        if args.command == "provision" and not os.environ.get("SIM_SCRIPT"):
+            reader_factory = lambda: VirtualNFCReader.blank_cards(args.sim_cards)
+        else:
+            reader_factory = lambda: VirtualNFCReader.from_file(os.environ.get("SIM_SCRIPT"))
+
+    if args.command == "provision":
+        conn = connect_registry(args.database)
+        try:
+            CardProvisioner(args.set_id, conn, reader_factory, count=args.count,
+                            overwrite=args.overwrite).run()
+        finally:
+            conn.close()
+    else:
+        handler = NFCHandler(reader_factory=reader_factory)
+        handler.run()
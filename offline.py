@@ -0,0 +1,63 @@
+"""Precache manifest for the kiosk's offline service worker.
+
+static/service-worker.js fetches /offline-manifest.json on install and
+whenever it notices a new version, caches every page and static asset it
+lists, and answers /handle-navigation from the navigation map while the
+server is unreachable. The version is a hash over the files' names, sizes
+and modification times, so editing a template or asset makes kiosks pick
+up a fresh copy on their next manifest check.
+"""
+import os
+import hashlib
+
+CACHE_PREFIX = "privacy-pac-"
+# Editor leftovers such as "quiz_logic copy.js" are never served by the pages
+SKIP_SUFFIXES = (" copy",)
+SKIP_FILES = ("service-worker.js",)
+
+
+def _asset_files(static_dir):
+    for root, dirs, files in os.walk(static_dir):
+        dirs.sort()
+        for name in sorted(files):
+            stem = os.path.splitext(name)[0]
+            if name.startswith(".") or name in SKIP_FILES or stem.endswith(SKIP_SUFFIXES):
+                continue
+            yield os.path.join(root, name)
+
+
+def _fingerprint(paths):
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{path}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:12]
+
+
+def build_manifest(static_dir, template_dir, page_routes, question_sets=()):
+    """Pages, assets and navigation the service worker needs to run offline"""
+    assets = list(_asset_files(static_dir))
+    templates = [os.path.join(template_dir, config["template"]) for config in page_routes.values()]
+    version = _fingerprint(assets + [t for t in templates if os.path.exists(t)])
+
+    pages = {}
+    for route, config in page_routes.items():
+        # The quiz is precached as a bare shell; the live page inlines a session
+        pages[route] = "/quiz?shell=1" if config["template"] == "quiz.html" else route
+
+    return {
+        "version": version,
+        "cache": CACHE_PREFIX + version,
+        "pages": pages,
+        "assets": ["/static/" + os.path.relpath(path, static_dir).replace(os.sep, "/") for path in assets],
+        # Offline copies don't open a session; answers given offline replay without one
+        "questions": {
+            f"/fetch_questions?set_id={set_id}": f"/fetch_questions?set_id={set_id}&offline=1"
+            for set_id in question_sets
+        },
+        "navigation": {
+            route: {"left": config.get("left"), "right": config.get("right")}
+            for route, config in page_routes.items()
+            if "left" in config or "right" in config
+        },
+    }
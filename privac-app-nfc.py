@@ -1,5 +1,5 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response
-from flask_socketio import SocketIO
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response, make_response
+from flask_socketio import SocketIO, emit
 import sqlite3
 import os
 import time
@@ -7,12 +7,25 @@ import threading
 import logging
 from datetime import datetime
 import json
+import uuid
+from latency import tracker as latency_tracker
+from database.question_bank import select_questions, question_sets, QUESTIONS_PER_QUIZ
+from database.replica import ReadReplica, choice_summary, export_responses
+from database.retention import start_maintenance_thread
+from session_store import sessions, bootstrap_payload, SESSION_COOKIE, SESSION_TTL
+from offline import build_manifest
+import metrics
+import profiler
+import liveness
+import wire
+from broker import EventBroker, guard_connection
+from admission import Admission, DUPLICATE, RETRY_AFTER
+from joystick import JoystickRouter
+from startup import warm_up, warm_database, warm_templates
+from log_setup import configure_logging, set_verbose, is_verbose
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+configure_logging("privac-app-nfc")
 logger = logging.getLogger(__name__)
 
 # Get base directory
@@ -24,6 +37,7 @@ app = Flask(__name__,
     static_folder=os.path.join(BASE_DIR, 'static'),
     static_url_path='/static'
 )
+metrics.instrument_app(app)
 
 # Configure app
 app.config.update(
@@ -36,29 +50,57 @@ app.config.update(
 # Initialize SocketIO
 socketio = SocketIO(
     app,
-    cors_allowed_origins="*",
-    async_mode='threading'
+    # Pages are served by this app; other browser origins must be listed in CORS_ORIGINS
+    cors_allowed_origins=[o for o in os.environ.get("CORS_ORIGINS", "").split(",") if o] or None,
+    async_mode='threading',
+    # Find dead clients in ~15 s instead of the default 45 s
+    ping_interval=10,
+    ping_timeout=5
 )
 
+# Per-client bounded buffers in front of every Socket.IO broadcast (see broker.py)
+socket_broker = EventBroker("socketio")
+socket_subscribers = {}
+SOCKETIO_MAX_BACKLOG = 32  # Packets queued in engine.io before a client counts as slow
+background_started = threading.Event()
+
+joystick = JoystickRouter(socket_broker.publish)
+
 # Database configuration
 DATABASE = os.path.join(BASE_DIR, "database/quiz_data.db")
+# Reports read a periodic snapshot so they never hold locks on the answer writes
+replica = ReadReplica(DATABASE)
 
 # Event queues
 class SafeQueue:
-    def __init__(self):
+    def __init__(self, name, limit=100):
+        self.name = name
+        self.limit = limit
         self.queue = []
         self.lock = threading.Lock()
 
     def append(self, item):
         with self.lock:
+            if len(self.queue) >= self.limit:
+                self.queue.pop(0)
+                metrics.EVENTS_DROPPED.inc(queue=self.name)
             self.queue.append(item)
+            metrics.QUEUE_DEPTH.set(len(self.queue), queue=self.name)
+        metrics.EVENTS_QUEUED.inc(queue=self.name)
 
     def get(self):
         with self.lock:
-            return self.queue.pop(0) if self.queue else None
-
-gpio_events = SafeQueue()
-nfc_events = SafeQueue()
+            item = self.queue.pop(0) if self.queue else None
+            if item is not None:
+                metrics.QUEUE_DEPTH.set(len(self.queue), queue=self.name)
+            return item
+
+# Presses coalesce to the latest one under STREAM_POLICY=coalesce
+gpio_broker = EventBroker("gpio", coalesce_key=lambda event: "choice")
+nfc_events = SafeQueue("nfc")
+gpio_admission = Admission("gpio-button-press", dedup_window=0.05)
+# A card left on the reader, or re-sent by a retrying client, counts once a second
+card_admission = Admission("nfc-event", dedup_window=1.0)
 
 def get_db():
     """Get database connection"""
@@ -74,6 +116,15 @@ def close_db(error):
     if db is not None:
         db.close()
 
+@app.route('/health')
+def health_check():
+    """Health check endpoint used by the hardware daemons"""
+    return jsonify({
+        "status": "ok",
+        "timestamp": time.time(),
+        "utc_time": datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    }), 200
+
 @app.route('/')
 def home():
     return render_template('Welcome-Home.html')
@@ -94,30 +145,82 @@ def insert_card():
 def loading():
     return render_template('loading.html')
 
+def load_quiz_bootstrap(set_id):
+    """Resume or start the visitor's session and bundle what the quiz page needs"""
+    db = get_db()
+    session_id = request.args.get("session_id") or request.cookies.get(SESSION_COOKIE)
+    with metrics.DB_QUERY.time(operation="quiz_bootstrap"):
+        payload = bootstrap_payload(db, PAGE_ROUTES, set_id, session_id)
+    db.commit()
+    return payload
+
+def with_session_cookie(response, payload):
+    """Remember the session so a reload of /quiz resumes it server-side"""
+    if payload:
+        response.set_cookie(SESSION_COOKIE, payload["session_id"],
+                            max_age=SESSION_TTL, samesite="Lax")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@app.route('/quiz/bootstrap')
+def quiz_bootstrap():
+    """Questions, session, navigation map and result pages in one request"""
+    set_id = request.args.get("set_id", "2")  # Same default as the page's auto-select
+    if not set_id.isdigit():
+        return jsonify({"error": "Invalid set_id"}), 400
+
+    try:
+        payload = load_quiz_bootstrap(int(set_id))
+        return with_session_cookie(jsonify(payload), payload)
+    except Exception as e:
+        logger.error(f"Error building quiz bootstrap: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/quiz')
 def quiz():
-    return render_template('quiz.html')
+    """Quiz page with its bootstrap payload inlined, so it starts without API calls"""
+    set_id = request.args.get("set_id", "2")
+    payload = None
+    # The service worker precaches a bare shell for offline use
+    if set_id.isdigit() and not request.args.get("shell"):
+        try:
+            payload = load_quiz_bootstrap(int(set_id))
+        except Exception as e:
+            # The page falls back to /quiz/session and /fetch_questions
+            logger.error(f"Error building quiz bootstrap: {e}")
+    response = make_response(render_template("quiz.html", bootstrap=payload))
+    return with_session_cookie(response, payload)
 
 @app.route('/fetch_questions')
 def fetch_questions():
     """Fetch quiz questions"""
     try:
         set_id = request.args.get("set_id", "1")
+        if not set_id.isdigit():
+            return jsonify({"error": "Invalid set_id"}), 400
         logger.info(f"Fetching questions for set_id: {set_id}")
         
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute("""
-            SELECT id, question, left_choice, right_choice 
-            FROM questions 
-            WHERE set_id = ? 
-            ORDER BY id ASC
-            LIMIT 5
-        """, (set_id,))
-        
-        questions = [dict(row) for row in cursor.fetchall()]
-        logger.info(f"Found {len(questions)} questions for set {set_id}")
-        return jsonify(questions)
+        # Reloading mid-quiz gets the same questions back
+        session = sessions.get(db, request.args.get("session_id"))
+        if session and session.status == "active" and session.set_id == int(set_id):
+            version, questions = session.version, session.questions
+        else:
+            # Sessions resuming mid-quiz pass back the content version they started on
+            version = request.args.get("version", type=int)
+            with metrics.DB_QUERY.time(operation="fetch_questions"):
+                version, questions = select_questions(db, int(set_id), QUESTIONS_PER_QUIZ, version)
+            session = None
+            # Service worker precache copies are served offline, without a session
+            if not request.args.get("offline"):
+                session = sessions.start(db, int(set_id), version, questions)
+                db.commit()
+        logger.info(f"Found {len(questions)} questions for set {set_id} (version {version})")
+        response = jsonify(questions)
+        response.headers["X-Question-Version"] = str(version)
+        if session is not None:
+            response.headers["X-Session-Id"] = session.session_id
+        return response
     except Exception as e:
         logger.error(f"Error fetching questions: {e}")
         return jsonify({"error": str(e)}), 500
@@ -127,36 +230,120 @@ def submit_response():
     """Submit quiz response"""
     try:
         data = request.get_json()
-        logger.info(f"Submitting response: {data}")
+        logger.info("Submitting response: %s", data, extra={"category": "response"})
         
         db = get_db()
         cursor = db.cursor()
-        cursor.execute("""
-            INSERT INTO responses (session_id, question_id, choice)
-            VALUES (?, ?, ?)
-        """, (data['session_id'], data['question_id'], data['choice']))
+        with metrics.DB_QUERY.time(operation="insert_response"):
+            cursor.execute("""
+                INSERT INTO responses (session_id, question_id, choice)
+                VALUES (?, ?, ?)
+            """, (data['session_id'], data['question_id'], data['choice']))
+            session = sessions.record_answer(db, data['session_id'], data['question_id'], data['choice'])
         
-        db.commit()
-        return jsonify({"status": "ok"})
+        with metrics.DB_COMMIT.time():
+            db.commit()
+        sessions.committed(session)
+        result = {"status": "ok", "session_id": data['session_id']}
+        if session is not None:
+            result.update(index=session.index, session_status=session.status)
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error submitting response: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/submit_responses', methods=['POST'])
+def submit_responses():
+    """Submit answers queued by the offline service worker in one transaction"""
+    items = (request.json or {}).get("responses")
+    if not isinstance(items, list):
+        return jsonify({"error": "Missing responses"}), 400
+
+    accepted = rejected = 0
+    answered = []
+    try:
+        db = get_db()
+        with metrics.DB_QUERY.time(operation="insert_responses"):
+            for item in items:
+                if not isinstance(item, dict) or not str(item.get("question_id", "")).isdigit() \
+                        or not item.get("choice"):
+                    rejected += 1
+                    continue
+                session_id = item.get("session_id") or str(uuid.uuid4())
+                # Keep the time the visitor answered, not the time the queue drained
+                db.execute("""
+                    INSERT INTO responses (session_id, question_id, choice, timestamp)
+                    VALUES (?, ?, ?, COALESCE(datetime(? / 1000.0, 'unixepoch'), CURRENT_TIMESTAMP))
+                """, (session_id, item["question_id"], item["choice"], item.get("answered_at")))
+                answered.append(sessions.record_answer(db, session_id, item["question_id"], item["choice"]))
+                accepted += 1
+        with metrics.DB_COMMIT.time():
+            db.commit()
+        for session in answered:
+            sessions.committed(session)
+
+        logger.info(f"Replayed {accepted} queued responses ({rejected} rejected)")
+        return jsonify({"accepted": accepted, "rejected": rejected})
+    except Exception as e:
+        logger.error(f"Error replaying responses: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/service-worker.js')
+def service_worker():
+    """Offline service worker, served from the root so its scope covers every page"""
+    response = send_from_directory(app.static_folder, "service-worker.js")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route('/offline-manifest.json')
+def offline_manifest():
+    """Pages, assets and navigation map for the service worker to precache"""
+    try:
+        sets = question_sets(get_db())
+        response = jsonify(build_manifest(app.static_folder, app.template_folder, PAGE_ROUTES, sets))
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    except Exception as e:
+        logger.error(f"Error building offline manifest: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/quiz/session')
+def quiz_session():
+    """Current state of a quiz session so a reloaded page can resume"""
+    try:
+        session = sessions.get(get_db(), request.args.get("session_id"))
+        if session is None:
+            return jsonify({"error": "Unknown session"}), 404
+        return jsonify(session.to_dict())
+    except Exception as e:
+        logger.error(f"Error loading session: {e}")
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/gpio-events')
 def gpio_events_stream():
     """SSE endpoint for GPIO events"""
+    guard_connection(request.environ)
+
     def generate():
-        while True:
-            try:
-                event = gpio_events.get()
-                if event:
-                    yield f"data: {{\"choice\": \"{event}\"}}\n\n"
-                else:
-                    yield "data: {\"type\": \"heartbeat\"}\n\n"
-                time.sleep(0.1)
-            except Exception as e:
-                logger.error(f"GPIO stream error: {e}")
-                time.sleep(1)
+        subscriber = gpio_broker.subscribe()
+        metrics.SSE_CLIENTS.inc(stream="gpio")
+        try:
+            while not subscriber.closed:
+                try:
+                    # Wake on the next press; only an idle stream gets a keep-alive comment
+                    batch = subscriber.get(wire.MAX_BATCH, wire.HEARTBEAT_IDLE)
+                    if batch:
+                        yield wire.sse_frame([wire.choice_event(latency_tracker.dequeued(e)) for e in batch])
+                    elif not subscriber.closed:
+                        yield wire.SSE_HEARTBEAT
+                except GeneratorExit:
+                    raise
+                except Exception as e:
+                    logger.error(f"GPIO stream error: {e}")
+                    time.sleep(1)
+        finally:
+            subscriber.close()
+            metrics.SSE_CLIENTS.dec(stream="gpio")
 
     return Response(
         generate(),
@@ -167,6 +354,12 @@ def gpio_events_stream():
         }
     )
 
+def shed_response(reason):
+    """Answer an event turned away by admission control"""
+    if reason == DUPLICATE:
+        return jsonify({'status': 'duplicate'})
+    return jsonify({'error': 'Too many events', 'reason': reason}), 429, {'Retry-After': str(RETRY_AFTER)}
+
 @app.route('/gpio-button-press', methods=['POST'])
 def gpio_button_press():
     """Handle GPIO button press"""
@@ -179,20 +372,141 @@ def gpio_button_press():
         if choice not in ['left', 'right']:
             return jsonify({'error': 'Invalid choice'}), 400
 
-        gpio_events.append(choice)
+        gesture = data.get('gesture', wire.PRESS)
+        if not isinstance(gesture, str) or (gesture != wire.PRESS and gesture not in wire.GESTURE_CODES):
+            return jsonify({'error': 'Invalid gesture'}), 400
+        # Part of the dedup key below, so it must be hashable
+        trace_id = data.get('trace_id')
+        if trace_id is not None and not isinstance(trace_id, str):
+            return jsonify({'error': 'Invalid trace_id'}), 400
+
+        # Identical events (same trace) inside the window are copies; distinct presses never are
+        reason = gpio_admission.enter(request.remote_addr, (choice, gesture, trace_id))
+        if reason:
+            return shed_response(reason)
+        try:
+            event = latency_tracker.button_press(data)
+            event['gesture'] = gesture
+            gpio_broker.publish(event)
+        finally:
+            gpio_admission.leave()
         return jsonify({'status': 'ok'})
     except Exception as e:
         logger.error(f"GPIO event error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/heartbeat', methods=['POST'])
+def heartbeat():
+    """Liveness ping from a hardware daemon"""
+    data = request.get_json(silent=True) or {}
+    if not metrics.record_heartbeat(data.get('component')):
+        return jsonify({'error': 'Unknown component'}), 400
+    return jsonify({'status': 'ok'})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of all registered metrics"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/debug/logging', methods=['GET', 'POST'])
+def debug_logging():
+    """Toggle verbose log tracing at runtime (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        set_verbose(bool(data.get('verbose')))
+    return jsonify({'verbose': is_verbose()})
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sample every thread's stack for ?seconds=N and return collapsed stacks (needs PROFILE_TOKEN)"""
+    if not profiler.enabled():
+        return jsonify({'error': 'Not found'}), 404
+    if not profiler.authorized(request.headers.get('Authorization')):
+        return jsonify({'error': 'Unauthorized'}), 401
+    seconds = request.args.get('seconds', default=profiler.DEFAULT_SECONDS, type=float)
+    if seconds is None or not 0 < seconds <= profiler.MAX_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {profiler.MAX_SECONDS}'}), 400
+    try:
+        result = profiler.sample(seconds)
+    except Exception as e:
+        logger.error(f"Error profiling: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    if result is None:
+        return jsonify({'error': 'A profile is already running'}), 409
+    counts, samples = result
+    logger.info(f"Profiled {samples} samples over {seconds:g}s")
+    return Response(profiler.collapsed(counts), mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename=profile-{int(time.time())}.folded',
+        'X-Profile-Samples': str(samples),
+    })
+
+@app.route('/reports/summary')
+def report_summary():
+    """Answer counts per question, read from the snapshot (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        conn = replica.connect()
+        try:
+            with metrics.DB_QUERY.time(operation="report_summary"):
+                summary = choice_summary(conn)
+        finally:
+            conn.close()
+        return jsonify({'snapshot_age': round(replica.age(), 1), 'questions': summary})
+    except Exception as e:
+        logger.error(f"Error building report: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/reports/responses.csv')
+def report_export():
+    """Stream every response as CSV from the snapshot (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        conn = replica.connect()
+    except Exception as e:
+        logger.error(f"Error opening snapshot: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    def rows():
+        try:
+            yield from export_responses(conn)
+        finally:
+            conn.close()
+
+    return Response(rows(), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=responses.csv'})
+
+@app.route('/metrics/latency', methods=['GET', 'POST'])
+def latency_metrics():
+    """Per-hop button latency histograms; browsers POST their half of each trace"""
+    if request.method == 'POST':
+        report = request.get_json(silent=True)
+        if not isinstance(report, dict) or 'trace_id' not in report:
+            return jsonify({'error': 'Missing trace_id'}), 400
+        if not latency_tracker.browser_report(report):
+            return jsonify({'error': 'Invalid latency report'}), 400
+        return '', 204
+    return jsonify(latency_tracker.snapshot())
+
 @app.route('/nfc-event', methods=['POST'])
 def nfc_event():
     """Handle NFC card detection"""
     try:
         data = request.get_json()
-        logger.info(f"NFC event received: {data}")
-        nfc_events.append(data)
-        socketio.emit('card_detected', data)
+        if not isinstance(data, dict):
+            return jsonify({"error": "Invalid card data"}), 400
+        reason = card_admission.enter(request.remote_addr, json.dumps(data, sort_keys=True))
+        if reason:
+            return shed_response(reason)
+        try:
+            logger.info(f"NFC event received: {data}")
+            nfc_events.append(data)
+            socket_broker.publish(wire.card_event(data))
+        finally:
+            card_admission.leave()
         return jsonify({"status": "ok"})
     except Exception as e:
         logger.error(f"NFC event error: {e}")
@@ -221,6 +535,82 @@ def handle_navigation():
         logger.error(f"Navigation error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def transport_backlog(sid):
+    """Packets engine.io still has to write to a client"""
+    eio_sid = socketio.server.manager.eio_sid_from_sid(sid, '/')
+    eio_socket = socketio.server.eio.sockets.get(eio_sid) if eio_sid else None
+    return eio_socket.queue.qsize() if eio_socket else 0
+
+def socketio_pump():
+    """Write each client's buffered events as one frame, skipping clients that are backed up"""
+    while True:
+        with socket_broker.ready:
+            socket_broker.ready.wait(timeout=0.05)
+        for sid, subscriber in list(socket_subscribers.items()):
+            try:
+                if subscriber.closed:
+                    # Fell too far behind under STREAM_POLICY=disconnect
+                    socket_subscribers.pop(sid, None)
+                    socketio.server.disconnect(sid)
+                    continue
+                if transport_backlog(sid) > SOCKETIO_MAX_BACKLOG:
+                    continue  # Events wait in the bounded buffer and its policy applies
+                batch = subscriber.get(wire.MAX_BATCH, 0)
+                if batch:
+                    socketio.emit(wire.SOCKET_EVENT, wire.frame(batch), to=sid)
+            except Exception as e:
+                logger.error(f"Socket.IO pump error for {sid}: {e}")
+
+def start_background_tasks():
+    """Start the Socket.IO pump and joystick flusher once, on the first connection"""
+    if not background_started.is_set():
+        background_started.set()
+        socketio.start_background_task(socketio_pump)
+        # Release coalesced joystick hovers as each client's rate allows
+        socketio.start_background_task(joystick.run, socketio.sleep)
+
+@socketio.on('connect')
+def handle_connect():
+    metrics.SOCKETIO_CLIENTS.inc()
+    start_background_tasks()
+    socket_subscribers[request.sid] = socket_broker.subscribe(key=request.sid)
+    emit('connection_established', {'client_id': joystick.connect(request.sid)})
+
+@socketio.on('disconnect')
+def handle_disconnect():
+    metrics.SOCKETIO_CLIENTS.dec()
+    joystick.disconnect(request.sid)
+    subscriber = socket_subscribers.pop(request.sid, None)
+    if subscriber is not None:
+        subscriber.close()
+
+@socketio.on('joystick_event')
+def handle_joystick_event(data):
+    """Route a joystick hover/select to the pages, coalescing rapid hovers"""
+    if joystick.handle(request.sid, data) == 'invalid':
+        logger.warning(f"Invalid joystick event from {request.sid}: {data}")
+
+@socketio.on('card_detected')
+def handle_card_detected(data):
+    """Relay a card read by the NFC handler to the kiosk pages"""
+    if not isinstance(data, dict):
+        logger.warning(f"Invalid card data from {request.sid}: {data}")
+        return
+    reason = card_admission.enter(request.remote_addr, json.dumps(data, sort_keys=True))
+    if reason:
+        return
+    try:
+        logger.info(f"NFC card detected: {data}")
+        nfc_events.append(data)
+        socket_broker.publish(wire.card_event(data), skip=request.sid)
+    finally:
+        card_admission.leave()
+
+@socketio.on('heartbeat')
+def handle_heartbeat(data):
+    """Liveness ping from the NFC handler over Socket.IO"""
+    metrics.record_heartbeat((data or {}).get('component'))
+
 @app.route("/static/<path:filename>")
 def serve_static(filename):
     """Serve static files"""
@@ -262,10 +652,8 @@ PAGE_ROUTES = {
 
 if __name__ == "__main__":
     try:
-        # Create required directories
+        # Create required directories (templates and static ship with the repo)
         os.makedirs(os.path.dirname(DATABASE), exist_ok=True)
-        os.makedirs(app.template_folder, exist_ok=True)
-        os.makedirs(app.static_folder, exist_ok=True)
 
         # Log startup info
         logger.info(f"Starting Privacy-Pac application (UTC: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})")
@@ -273,13 +661,25 @@ if __name__ == "__main__":
         logger.info(f"Template directory: {app.template_folder}")
         logger.info(f"Static directory: {app.static_folder}")
 
+        # Archive old responses off-peak and close quiz sessions abandoned mid-way
+        start_maintenance_thread(DATABASE)
+        sessions.start_reaper(DATABASE)
+        replica.start_refresher()
+        # Under supervisor.py: beat while the server answers its own health check
+        liveness.start_probe("http://127.0.0.1:5004/health")
+        # Migrations and template compiles happen while the server binds, not on the first visitor
+        warm_up(("database", lambda: warm_database(DATABASE)),
+                ("templates", lambda: warm_templates(app, [c["template"] for c in PAGE_ROUTES.values()])))
+
         # Start server
         socketio.run(
             app,
             host="0.0.0.0",
             port=5004,
             debug=True,
-            use_reloader=False
+            use_reloader=False,
+            # Flask-SocketIO refuses to serve without a terminal on stdin, as under supervisor.py
+            **({"allow_unsafe_werkzeug": True} if liveness.enabled() else {})
         )
     except KeyboardInterrupt:
         logger.info("Shutting down gracefully...")
@@ -1,25 +1,40 @@
 import sqlite3
 import os
 import time
-import threading
-from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response, stream_with_context
+from flask import Flask, render_template, request, jsonify, send_from_directory, g, Response, stream_with_context, make_response
 import uuid
 import logging
 from datetime import datetime
+from database.retention import start_maintenance_thread
+from database.replica import ReadReplica, choice_summary, export_responses
+from database.question_bank import select_questions, question_sets, QUESTIONS_PER_QUIZ
+from session_store import sessions, bootstrap_payload, SESSION_COOKIE, SESSION_TTL
+from offline import build_manifest
+from latency import tracker as latency_tracker
+import metrics
+import profiler
+import wire
+from broker import EventBroker, guard_connection
+from admission import Admission, DUPLICATE, RETRY_AFTER
+from startup import warm_up, warm_database, warm_templates
+from log_setup import configure_logging, set_verbose, is_verbose
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+configure_logging("privacy-app")
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+metrics.instrument_app(app)
 
 # Database configuration
 DATABASE = "database/quiz_data.db"
-gpio_events = []
-gpio_lock = threading.Lock()
+# Reports read a periodic snapshot so they never hold locks on the answer writes
+replica = ReadReplica(DATABASE)
+STATIC_DIR = os.path.join(app.root_path, "static")
+TEMPLATE_DIR = os.path.join(app.root_path, "templates")
+# Presses coalesce to the latest one under STREAM_POLICY=coalesce
+gpio_broker = EventBroker("gpio", coalesce_key=lambda event: "choice")
+gpio_admission = Admission("gpio-button-press", dedup_window=0.05)
 
 # Page navigation configuration
 PAGE_ROUTES = {
@@ -111,21 +126,35 @@ def health_check():
 @app.route('/gpio-events')
 def gpio_events_stream():
     """SSE endpoint for GPIO events"""
+    guard_connection(request.environ)
+
     def event_stream():
-        while True:
-            with gpio_lock:
-                if gpio_events:
-                    choice = gpio_events.pop(0)
-                    yield f'data: {{"choice": "{choice}"}}\n\n'
-                else:
-                    yield 'data: {"type": "heartbeat"}\n\n'
-            time.sleep(0.1)
+        # Each stream has its own bounded buffer; see broker.py for the overflow policy
+        subscriber = gpio_broker.subscribe()
+        metrics.SSE_CLIENTS.inc(stream="gpio")
+        try:
+            while not subscriber.closed:
+                # Wake on the next press; only an idle stream gets a keep-alive comment
+                batch = subscriber.get(wire.MAX_BATCH, wire.HEARTBEAT_IDLE)
+                if batch:
+                    yield wire.sse_frame([wire.choice_event(latency_tracker.dequeued(e)) for e in batch])
+                elif not subscriber.closed:
+                    yield wire.SSE_HEARTBEAT
+        finally:
+            subscriber.close()
+            metrics.SSE_CLIENTS.dec(stream="gpio")
     
     return Response(
         stream_with_context(event_stream()),
         mimetype='text/event-stream'
     )
 
+def shed_response(reason):
+    """Answer an event turned away by admission control"""
+    if reason == DUPLICATE:
+        return jsonify({'status': 'duplicate'})
+    return jsonify({'error': 'Too many events', 'reason': reason}), 429, {'Retry-After': str(RETRY_AFTER)}
+
 @app.route('/gpio-button-press', methods=['POST'])
 def gpio_button_press():
     """Handle GPIO button press events"""
@@ -138,14 +167,126 @@ def gpio_button_press():
         if choice not in ['left', 'right']:
             return jsonify({'error': 'Invalid choice'}), 400
 
-        with gpio_lock:
-            gpio_events.append(choice)
+        gesture = data.get('gesture', wire.PRESS)
+        if not isinstance(gesture, str) or (gesture != wire.PRESS and gesture not in wire.GESTURE_CODES):
+            return jsonify({'error': 'Invalid gesture'}), 400
+        # Part of the dedup key below, so it must be hashable
+        trace_id = data.get('trace_id')
+        if trace_id is not None and not isinstance(trace_id, str):
+            return jsonify({'error': 'Invalid trace_id'}), 400
+
+        # Identical events (same trace) inside the window are copies; distinct presses never are
+        reason = gpio_admission.enter(request.remote_addr, (choice, gesture, trace_id))
+        if reason:
+            return shed_response(reason)
+        try:
+            event = latency_tracker.button_press(data)
+            event['gesture'] = gesture
+            gpio_broker.publish(event)
+        finally:
+            gpio_admission.leave()
             
         return jsonify({'status': 'ok'})
     except Exception as e:
         logger.error(f"Error handling GPIO button press: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/heartbeat', methods=['POST'])
+def heartbeat():
+    """Liveness ping from a hardware daemon"""
+    data = request.get_json(silent=True) or {}
+    if not metrics.record_heartbeat(data.get('component')):
+        return jsonify({'error': 'Unknown component'}), 400
+    return jsonify({'status': 'ok'})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of all registered metrics"""
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/debug/logging', methods=['GET', 'POST'])
+def debug_logging():
+    """Toggle verbose log tracing at runtime (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        set_verbose(bool(data.get('verbose')))
+    return jsonify({'verbose': is_verbose()})
+
+@app.route('/debug/profile')
+def debug_profile():
+    """Sample every thread's stack for ?seconds=N and return collapsed stacks (needs PROFILE_TOKEN)"""
+    if not profiler.enabled():
+        return jsonify({'error': 'Not found'}), 404
+    if not profiler.authorized(request.headers.get('Authorization')):
+        return jsonify({'error': 'Unauthorized'}), 401
+    seconds = request.args.get('seconds', default=profiler.DEFAULT_SECONDS, type=float)
+    if seconds is None or not 0 < seconds <= profiler.MAX_SECONDS:
+        return jsonify({'error': f'seconds must be between 0 and {profiler.MAX_SECONDS}'}), 400
+    try:
+        result = profiler.sample(seconds)
+    except Exception as e:
+        logger.error(f"Error profiling: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    if result is None:
+        return jsonify({'error': 'A profile is already running'}), 409
+    counts, samples = result
+    logger.info(f"Profiled {samples} samples over {seconds:g}s")
+    return Response(profiler.collapsed(counts), mimetype='text/plain', headers={
+        'Content-Disposition': f'attachment; filename=profile-{int(time.time())}.folded',
+        'X-Profile-Samples': str(samples),
+    })
+
+@app.route('/reports/summary')
+def report_summary():
+    """Answer counts per question, read from the snapshot (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        conn = replica.connect()
+        try:
+            with metrics.DB_QUERY.time(operation="report_summary"):
+                summary = choice_summary(conn)
+        finally:
+            conn.close()
+        return jsonify({'snapshot_age': round(replica.age(), 1), 'questions': summary})
+    except Exception as e:
+        logger.error(f"Error building report: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/reports/responses.csv')
+def report_export():
+    """Stream every response as CSV from the snapshot (local requests only)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Forbidden'}), 403
+    try:
+        conn = replica.connect()
+    except Exception as e:
+        logger.error(f"Error opening snapshot: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    def rows():
+        try:
+            yield from export_responses(conn)
+        finally:
+            conn.close()
+
+    return Response(rows(), mimetype='text/csv',
+                    headers={'Content-Disposition': 'attachment; filename=responses.csv'})
+
+@app.route('/metrics/latency', methods=['GET', 'POST'])
+def latency_metrics():
+    """Per-hop button latency histograms; browsers POST their half of each trace"""
+    if request.method == 'POST':
+        report = request.get_json(silent=True)
+        if not isinstance(report, dict) or 'trace_id' not in report:
+            return jsonify({'error': 'Missing trace_id'}), 400
+        if not latency_tracker.browser_report(report):
+            return jsonify({'error': 'Invalid latency report'}), 400
+        return '', 204
+    return jsonify(latency_tracker.snapshot())
+
 @app.route('/handle-navigation', methods=['POST'])
 def handle_navigation():
     """Handle page navigation"""
@@ -181,22 +322,34 @@ def fetch_questions():
     
     if not set_id:
         return jsonify({"error": "Missing set_id"}), 400
+    if not set_id.isdigit():
+        return jsonify({"error": "Invalid set_id"}), 400
 
     try:
         db = get_db()
-        cursor = db.cursor()
-        cursor.execute(
-            """SELECT id, question, left_choice, right_choice 
-               FROM questions WHERE set_id = ? 
-               ORDER BY id ASC LIMIT 5""",
-            (set_id,)
-        )
-        questions = [dict(row) for row in cursor.fetchall()]
+        # Reloading mid-quiz gets the same questions back
+        session = sessions.get(db, request.args.get("session_id"))
+        if session and session.status == "active" and session.set_id == int(set_id):
+            version, questions = session.version, session.questions
+        else:
+            # Sessions resuming mid-quiz pass back the content version they started on
+            version = request.args.get("version", type=int)
+            with metrics.DB_QUERY.time(operation="fetch_questions"):
+                version, questions = select_questions(db, int(set_id), QUESTIONS_PER_QUIZ, version)
+            session = None
+            # Service worker precache copies are served offline, without a session
+            if not request.args.get("offline"):
+                session = sessions.start(db, int(set_id), version, questions)
+                db.commit()
 
-        if len(questions) < 5:
+        if len(questions) < QUESTIONS_PER_QUIZ:
             logger.warning(f"Only {len(questions)} questions found for set {set_id}")
         
-        return jsonify(questions)
+        response = jsonify(questions)
+        response.headers["X-Question-Version"] = str(version)
+        if session is not None:
+            response.headers["X-Session-Id"] = session.session_id
+        return response
     except Exception as e:
         logger.error(f"Error fetching questions: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -205,7 +358,7 @@ def fetch_questions():
 def submit_response():
     """Submit quiz response"""
     data = request.json
-    logger.info(f"Incoming response: {data}")
+    logger.info("Incoming response: %s", data, extra={"category": "response"})
 
     session_id = data.get("session_id") or str(uuid.uuid4())
     question_id = data.get("question_id")
@@ -217,20 +370,141 @@ def submit_response():
     try:
         db = get_db()
         cursor = db.cursor()
-        cursor.execute("""
-            INSERT INTO responses (session_id, question_id, choice, timestamp)
-            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-        """, (session_id, question_id, choice))
-        db.commit()
+        with metrics.DB_QUERY.time(operation="insert_response"):
+            cursor.execute("""
+                INSERT INTO responses (session_id, question_id, choice, timestamp)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """, (session_id, question_id, choice))
+            session = sessions.record_answer(db, session_id, question_id, choice)
+        with metrics.DB_COMMIT.time():
+            db.commit()
+        sessions.committed(session)
         
-        return jsonify({"session_id": session_id})
+        result = {"status": "ok", "session_id": session_id}
+        if session is not None:
+            result.update(index=session.index, session_status=session.status)
+        return jsonify(result)
     except Exception as e:
         logger.error(f"Error submitting response: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/submit_responses", methods=["POST"])
+def submit_responses():
+    """Submit answers queued by the offline service worker in one transaction"""
+    items = (request.json or {}).get("responses")
+    if not isinstance(items, list):
+        return jsonify({"error": "Missing responses"}), 400
+
+    accepted = rejected = 0
+    answered = []
+    try:
+        db = get_db()
+        with metrics.DB_QUERY.time(operation="insert_responses"):
+            for item in items:
+                if not isinstance(item, dict) or not str(item.get("question_id", "")).isdigit() \
+                        or not item.get("choice"):
+                    rejected += 1
+                    continue
+                session_id = item.get("session_id") or str(uuid.uuid4())
+                # Keep the time the visitor answered, not the time the queue drained
+                db.execute("""
+                    INSERT INTO responses (session_id, question_id, choice, timestamp)
+                    VALUES (?, ?, ?, COALESCE(datetime(? / 1000.0, 'unixepoch'), CURRENT_TIMESTAMP))
+                """, (session_id, item["question_id"], item["choice"], item.get("answered_at")))
+                answered.append(sessions.record_answer(db, session_id, item["question_id"], item["choice"]))
+                accepted += 1
+        with metrics.DB_COMMIT.time():
+            db.commit()
+        for session in answered:
+            sessions.committed(session)
+
+        logger.info(f"Replayed {accepted} queued responses ({rejected} rejected)")
+        return jsonify({"accepted": accepted, "rejected": rejected})
+    except Exception as e:
+        logger.error(f"Error replaying responses: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/service-worker.js")
+def service_worker():
+    """Offline service worker, served from the root so its scope covers every page"""
+    response = send_from_directory(STATIC_DIR, "service-worker.js")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@app.route("/offline-manifest.json")
+def offline_manifest():
+    """Pages, assets and navigation map for the service worker to precache"""
+    try:
+        sets = question_sets(get_db())
+        response = jsonify(build_manifest(STATIC_DIR, TEMPLATE_DIR, PAGE_ROUTES, sets))
+        response.headers["Cache-Control"] = "no-store"
+        return response
+    except Exception as e:
+        logger.error(f"Error building offline manifest: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/quiz/session")
+def quiz_session():
+    """Current state of a quiz session so a reloaded page can resume"""
+    try:
+        session = sessions.get(get_db(), request.args.get("session_id"))
+        if session is None:
+            return jsonify({"error": "Unknown session"}), 404
+        return jsonify(session.to_dict())
+    except Exception as e:
+        logger.error(f"Error loading session: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def load_quiz_bootstrap(set_id):
+    """Resume or start the visitor's session and bundle what the quiz page needs"""
+    db = get_db()
+    session_id = request.args.get("session_id") or request.cookies.get(SESSION_COOKIE)
+    with metrics.DB_QUERY.time(operation="quiz_bootstrap"):
+        payload = bootstrap_payload(db, PAGE_ROUTES, set_id, session_id)
+    db.commit()
+    return payload
+
+def with_session_cookie(response, payload):
+    """Remember the session so a reload of /quiz resumes it server-side"""
+    if payload:
+        response.set_cookie(SESSION_COOKIE, payload["session_id"],
+                            max_age=SESSION_TTL, samesite="Lax")
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+@app.route("/quiz/bootstrap")
+def quiz_bootstrap():
+    """Questions, session, navigation map and result pages in one request"""
+    set_id = request.args.get("set_id", "2")  # Same default as the page's auto-select
+    if not set_id.isdigit():
+        return jsonify({"error": "Invalid set_id"}), 400
+
+    try:
+        payload = load_quiz_bootstrap(int(set_id))
+        return with_session_cookie(jsonify(payload), payload)
+    except Exception as e:
+        logger.error(f"Error building quiz bootstrap: {str(e)}")
+        return jsonify({"error": str(e)}), 500
+
+def quiz_page():
+    """Quiz page with its bootstrap payload inlined, so it starts without API calls"""
+    set_id = request.args.get("set_id", "2")
+    payload = None
+    # The service worker precaches a bare shell for offline use
+    if set_id.isdigit() and not request.args.get("shell"):
+        try:
+            payload = load_quiz_bootstrap(int(set_id))
+        except Exception as e:
+            # The page falls back to /quiz/session and /fetch_questions
+            logger.error(f"Error building quiz bootstrap: {str(e)}")
+    response = make_response(render_template("quiz.html", bootstrap=payload))
+    return with_session_cookie(response, payload)
+
 # Dynamic route generation for all pages
 for route, config in PAGE_ROUTES.items():
     def create_route_handler(template_name):
+        if template_name == "quiz.html":
+            return quiz_page
         def route_handler():
             return render_template(template_name)
         return route_handler
@@ -262,5 +536,13 @@ def serve_static(filename):
 
 if __name__ == "__main__":
     os.makedirs(os.path.dirname(DATABASE), exist_ok=True)
+    # The debug reloader runs this block twice; only the serving child maintains the DB
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_maintenance_thread(DATABASE)
+        sessions.start_reaper(DATABASE)
+        replica.start_refresher()
+        # Migrations and template compiles happen while the server binds, not on the first visitor
+        warm_up(("database", lambda: warm_database(DATABASE)),
+                ("templates", lambda: warm_templates(app, [c["template"] for c in PAGE_ROUTES.values()])))
     logger.info(f"Starting Privacy-Pac Flask application on port 5004 (UTC: {datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')})")
     app.run(host="0.0.0.0", port=5004, debug=True)
@@ -0,0 +1,95 @@
+"""On-demand stack sampling profiler for the running apps.
+
+GET /debug/profile?seconds=N samples the Python stack of every thread
+(request handlers, SSE generators, Socket.IO workers, the snapshot,
+retention and session reaper threads) every PROFILE_INTERVAL_MS for N
+seconds and returns them as collapsed stacks, one line per distinct
+stack:
+
+    thread;outer_function (file.py:12);inner_function (file.py:34) 17
+
+which flamegraph.pl, speedscope and inferno read directly. Sampling only
+reads sys._current_frames() from one extra thread, so nothing is traced
+and the server keeps running normally while a profile is taken. Samples
+are wall-clock: threads that are waiting (an idle SSE generator, a
+sleeping daemon thread) show up in the stack they wait in.
+
+The endpoint is off unless PROFILE_TOKEN is set, and every request must
+send it as `Authorization: Bearer <token>`.
+"""
+import os
+import sys
+import hmac
+import time
+import threading
+from collections import Counter
+
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "10"))
+DEFAULT_SECONDS = 5
+MAX_SECONDS = 60
+MAX_DEPTH = 128  # Deeper stacks are cut at the root end
+
+_running = threading.Lock()
+
+
+def enabled():
+    return bool(PROFILE_TOKEN)
+
+
+def authorized(header):
+    """True if an Authorization header carries PROFILE_TOKEN"""
+    if not PROFILE_TOKEN or not header:
+        return False
+    scheme, _, token = header.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), PROFILE_TOKEN)
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def collect(counts, skip):
+    """Add the current stack of every thread except `skip` to counts"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    for ident, frame in sys._current_frames().items():
+        if ident == skip:
+            continue
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            stack.append(frame_label(frame))
+            frame = frame.f_back
+        stack.append(names.get(ident, f"thread-{ident}").replace(";", ":"))
+        counts[";".join(reversed(stack))] += 1
+
+
+def sample(seconds, interval_ms=PROFILE_INTERVAL_MS):
+    """Sample all threads for `seconds`; returns (Counter of stacks, sample count),
+    or None if another profile is already running"""
+    if not _running.acquire(blocking=False):
+        return None
+    try:
+        counts = Counter()
+        interval = interval_ms / 1000
+        me = threading.get_ident()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        next_at = time.monotonic()
+        while next_at < deadline:
+            collect(counts, me)
+            samples += 1
+            next_at += interval
+            # Fixed schedule; a slow sample skips ahead instead of bursting to catch up
+            now = time.monotonic()
+            if next_at < now:
+                next_at = now
+            time.sleep(max(0.0, next_at - now))
+        return counts, samples
+    finally:
+        _running.release()
+
+
+def collapsed(counts):
+    """Collapsed stack lines, most sampled first"""
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
@@ -0,0 +1,27 @@
+import time
+import threading
+
+
+class TokenBucket:
+    """Classic token bucket on the monotonic clock.
+
+    `rate` tokens are added per second up to `capacity`; each allowed event
+    takes one token. Safe to share between threads.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self, cost=1.0):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= cost:
+                self.tokens -= cost
+                return True
+            return False
@@ -0,0 +1,258 @@
+"""Server-side quiz sessions with resume and idle eviction.
+
+Each session records its question set, content version, the questions it
+was dealt and the answers given so far. Active sessions live in a small
+in-memory LRU for instant resume and are written through to the
+quiz_sessions table, so a session survives both cache eviction and a
+server restart. Sessions idle for longer than SESSION_TTL are closed as
+'abandoned' by a background reaper.
+"""
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+
+from database.question_bank import questions_by_id, select_questions, QUESTIONS_PER_QUIZ
+
+logger = logging.getLogger(__name__)
+
+SESSION_TTL = 10 * 60  # Idle seconds before an unfinished quiz is abandoned
+SESSION_COOKIE = "quiz_session"
+CACHE_SIZE = 256
+REAP_INTERVAL = 60
+
+SESSIONS_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS quiz_sessions (
+    session_id TEXT PRIMARY KEY,
+    set_id INTEGER NOT NULL,
+    version INTEGER NOT NULL,
+    question_ids TEXT NOT NULL,
+    answers TEXT NOT NULL DEFAULT '[]',
+    status TEXT NOT NULL DEFAULT 'active',
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+SESSIONS_INDEX_SQL = "CREATE INDEX IF NOT EXISTS idx_quiz_sessions_status ON quiz_sessions (status, updated)"
+
+
+class QuizSession:
+    __slots__ = ("session_id", "set_id", "version", "questions", "answers",
+                 "status", "created", "updated")
+
+    def __init__(self, session_id, set_id, version, questions, answers=None,
+                 status="active", created=None, updated=None):
+        now = time.time()
+        self.session_id = session_id
+        self.set_id = set_id
+        self.version = version
+        self.questions = questions
+        self.answers = answers or []  # [question_id, choice] pairs in order
+        self.status = status
+        self.created = created or now
+        self.updated = updated or now
+
+    @property
+    def index(self):
+        return len(self.answers)
+
+    @property
+    def right_count(self):
+        return sum(1 for _, choice in self.answers if choice == "right")
+
+    def to_dict(self):
+        return {
+            "session_id": self.session_id,
+            "set_id": self.set_id,
+            "version": self.version,
+            "status": self.status,
+            "index": self.index,
+            "right_count": self.right_count,
+            "questions": self.questions,
+        }
+
+
+class SessionStore:
+    def __init__(self, ttl=SESSION_TTL, capacity=CACHE_SIZE):
+        self.ttl = ttl
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+        self.ready = set()  # database files whose table exists
+
+    def _ensure_table(self, conn):
+        path = conn.execute("PRAGMA database_list").fetchone()[2]
+        if path not in self.ready:
+            conn.execute(SESSIONS_TABLE_SQL)
+            conn.execute(SESSIONS_INDEX_SQL)
+            self.ready.add(path)
+
+    def _remember(self, session):
+        with self.lock:
+            self.cache[session.session_id] = session
+            self.cache.move_to_end(session.session_id)
+            while len(self.cache) > self.capacity:
+                # Still persisted; it will be reloaded if the visitor returns
+                self.cache.popitem(last=False)
+
+    def _persist(self, conn, session):
+        conn.execute(
+            """INSERT OR REPLACE INTO quiz_sessions
+               (session_id, set_id, version, question_ids, answers, status, created, updated)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (session.session_id, session.set_id, session.version,
+             json.dumps([q["id"] for q in session.questions]),
+             json.dumps(session.answers), session.status,
+             session.created, session.updated)
+        )
+
+    def get(self, conn, session_id):
+        """Return the session if it exists and hasn't expired"""
+        if not session_id:
+            return None
+        with self.lock:
+            session = self.cache.get(session_id)
+            if session is not None:
+                self.cache.move_to_end(session_id)
+        if session is None:
+            self._ensure_table(conn)
+            row = conn.execute(
+                """SELECT set_id, version, question_ids, answers, status, created, updated
+                   FROM quiz_sessions WHERE session_id = ?""",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            set_id, version, question_ids, answers, status, created, updated = tuple(row)
+            session = QuizSession(
+                session_id, set_id, version,
+                questions_by_id(conn, json.loads(question_ids)),
+                json.loads(answers), status, created, updated
+            )
+            self._remember(session)
+        if session.status == "active" and time.time() - session.updated > self.ttl:
+            session.status = "abandoned"
+        return session
+
+    def start(self, conn, set_id, version, questions, session_id=None):
+        """Open a new session; the caller commits"""
+        self._ensure_table(conn)
+        session = QuizSession(session_id or str(uuid.uuid4()), set_id, version, questions)
+        self._persist(conn, session)
+        self._remember(session)
+        return session
+
+    def record_answer(self, conn, session_id, question_id, choice):
+        """Advance a session by one answer; the caller commits, then passes the
+        returned session to committed().
+
+        Answers for a question other than the current one (double submits,
+        stale tabs) are ignored so the index can't drift. The check reads the
+        row after taking the database write lock, so concurrent submits (from
+        any thread or either app) are checked one after another, and answers
+        earlier in the same transaction are seen. The cached session is left
+        alone until the commit has succeeded.
+        """
+        cached = self.get(conn, session_id)
+        if cached is None or cached.status != "active":
+            return cached
+        # A no-op write takes the write lock before the answers are read
+        conn.execute("UPDATE quiz_sessions SET updated = updated WHERE session_id = ?", (session_id,))
+        row = conn.execute(
+            "SELECT answers, status, updated FROM quiz_sessions WHERE session_id = ?",
+            (session_id,)
+        ).fetchone()
+        if row is None:
+            return cached
+        answers, status, updated = tuple(row)
+        session = QuizSession(session_id, cached.set_id, cached.version, cached.questions,
+                              json.loads(answers), status, cached.created, updated)
+        if session.status != "active":
+            return session
+        expected = session.questions[session.index]["id"] if session.index < len(session.questions) else None
+        if expected != int(question_id):
+            return session
+
+        session.answers.append([int(question_id), choice])
+        session.updated = time.time()
+        if session.index >= len(session.questions):
+            session.status = "completed"
+        self._persist(conn, session)
+        return session
+
+    def committed(self, session):
+        """Cache a session from record_answer once its transaction has committed"""
+        if session is None:
+            return
+        with self.lock:
+            cached = self.cache.get(session.session_id)
+            if cached is not None and cached.index > session.index:
+                return  # A later answer committed and was cached first
+        self._remember(session)
+
+    def reap(self, database):
+        """Close sessions idle for longer than the TTL; returns how many"""
+        cutoff = time.time() - self.ttl
+        conn = sqlite3.connect(database, timeout=10)
+        try:
+            self._ensure_table(conn)
+            with conn:
+                closed = conn.execute(
+                    "UPDATE quiz_sessions SET status = 'abandoned' "
+                    "WHERE status = 'active' AND updated < ?",
+                    (cutoff,)
+                ).rowcount
+        finally:
+            conn.close()
+
+        with self.lock:
+            for session_id in [sid for sid, s in self.cache.items()
+                               if s.status != "active" or s.updated < cutoff]:
+                del self.cache[session_id]
+        if closed:
+            logger.info(f"Closed {closed} abandoned quiz sessions")
+        return closed
+
+    def start_reaper(self, database, interval=REAP_INTERVAL):
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap(database)
+                except Exception as e:
+                    logger.error(f"Session reaper failed: {str(e)}")
+
+        thread = threading.Thread(target=loop, name="session-reaper", daemon=True)
+        thread.start()
+        return thread
+
+
+sessions = SessionStore()
+
+
+def bootstrap_payload(conn, page_routes, set_id, session_id=None):
+    """Everything the quiz page needs to start without further requests.
+
+    Resumes the given session when it is still active on the same set,
+    otherwise deals a new one; the caller commits.
+    """
+    session = sessions.get(conn, session_id)
+    if not (session and session.status == "active" and session.set_id == set_id):
+        version, questions = select_questions(conn, set_id, QUESTIONS_PER_QUIZ)
+        session = sessions.start(conn, set_id, version, questions)
+
+    navigation = {
+        route: {"left": config.get("left"), "right": config.get("right")}
+        for route, config in page_routes.items()
+        if "left" in config or "right" in config
+    }
+    # Result page per number of right-hand answers, as determineResultPage() picks them
+    results = {
+        str(score): f"/{score}.html"
+        for score in range(QUESTIONS_PER_QUIZ + 1)
+        if f"/{score}" in page_routes
+    }
+    return dict(session.to_dict(), navigation=navigation, results=results)
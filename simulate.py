@@ -0,0 +1,245 @@
+"""Hardware-free scenario runner for the full kiosk stack.
+
+Starts privac-app-nfc.py on a local port against a copy of the database,
+runs the real ButtonHandler and NFCHandler on ScriptedGPIO and
+VirtualNFCReader backends, and plays a simulated kiosk browser that follows
+/gpio-events and Socket.IO card events through the page flow and quiz.
+Daemon time runs `--speed` times faster than real time; the server's own
+timers (e.g. the SSE poll) stay real.
+
+    python simulate.py --visitors 1000 --speed 4
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import sqlite3
+import argparse
+import tempfile
+import threading
+import importlib.util
+
+import requests
+import socketio
+from werkzeug.serving import make_server
+
+import wire
+from fake_hardware import SimClock, ScriptedGPIO, VirtualNFCReader
+from button_press_handler import ButtonHandler, LEFT_BUTTON_PIN, RIGHT_BUTTON_PIN
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATABASE = os.path.join(BASE_DIR, "database/quiz_data.db")
+QUESTIONS_PER_QUIZ = 5
+PINS = {"left": LEFT_BUTTON_PIN, "right": RIGHT_BUTTON_PIN}
+
+
+def load_module(filename, name):
+    """Import one of the hyphenated scripts by path"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(BASE_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def build_script(visitors, think_time, hold, sets=(1, 2)):
+    """Scripted presses and card taps for back-to-back visitors.
+
+    Each visitor presses right through Welcome -> Conditions -> Terms ->
+    Insert Card, taps a card, presses right to start the quiz, answers five
+    questions and presses right on the result page.
+    """
+    presses, cards = [], []
+    t = 1.0
+    for _ in range(visitors):
+        for _ in range(3):
+            presses.append((PINS["right"], t, hold))
+            t += think_time
+        cards.append((t, {"set_id": random.choice(sets)}))
+        t += think_time
+        presses.append((PINS["right"], t, hold))
+        t += think_time
+        for _ in range(QUESTIONS_PER_QUIZ):
+            presses.append((PINS[random.choice(["left", "right"])], t, hold))
+            t += think_time
+        presses.append((PINS["right"], t, hold))
+        t += think_time
+    return presses, cards, t
+
+
+class SimBrowser:
+    """Follows the kiosk page flow the way the templates' JavaScript does"""
+
+    def __init__(self, base_url, stats):
+        self.base_url = base_url
+        self.stats = stats
+        self.http = requests.Session()
+        self.sio = socketio.Client()
+        self.running = True
+        self.set_id = 1
+        self.reset()
+        self.sio.on(wire.SOCKET_EVENT, self.on_frame)
+
+    def reset(self):
+        self.page = "/"
+        self.questions = []
+        self.index = 0
+        self.right = 0
+        self.session_id = str(uuid.uuid4())
+
+    def on_frame(self, text):
+        for event in wire.decode(text)[1]:
+            if event["type"] == "card":
+                self.on_card(event["data"])
+
+    def on_card(self, data):
+        self.stats["cards_delivered"] += 1
+        self.set_id = data.get("set_id", self.set_id)
+
+    def on_choice(self, choice):
+        self.stats["presses_delivered"] += 1
+        if self.page == "/quiz":
+            question = self.questions[self.index]
+            response = self.http.post(f"{self.base_url}/submit_response", json={
+                "session_id": self.session_id,
+                "question_id": question["id"],
+                "choice": choice
+            })
+            self.stats["answers_ok" if response.ok else "answers_failed"] += 1
+            self.right += choice == "right"
+            self.index += 1
+            if self.index >= len(self.questions):
+                self.page = f"/{min(self.right, 5)}"
+            return
+
+        response = self.http.post(f"{self.base_url}/handle-navigation", json={
+            "current_page": self.page,
+            "choice": choice
+        })
+        redirect = response.json().get("redirect") if response.ok else "/"
+        if redirect == "/loading":
+            # loading.html forwards to the quiz on its own
+            self.page = "/quiz"
+            self.questions = self.http.get(
+                f"{self.base_url}/fetch_questions", params={"set_id": self.set_id}
+            ).json()[:QUESTIONS_PER_QUIZ]
+            self.index = 0
+        elif self.page not in ("/", "/conditions", "/terms", "/insert_card"):
+            # Leaving a result page ends the visit
+            self.stats["visitors_completed"] += 1
+            self.reset()
+        else:
+            self.page = redirect or "/"
+
+    def listen(self):
+        with self.http.get(f"{self.base_url}/gpio-events", stream=True, timeout=30) as stream:
+            for line in stream.iter_lines(decode_unicode=True):
+                if not self.running:
+                    break
+                if line and line.startswith("data:"):
+                    for event in wire.decode(line[5:])[1]:
+                        if event["type"] == "choice":
+                            self.on_choice(event["choice"])
+
+    def start(self):
+        self.sio.connect(self.base_url)
+        threading.Thread(target=self.listen, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        self.sio.disconnect()
+
+
+def run_scenario(args):
+    workdir = tempfile.mkdtemp(prefix="privacy-pac-sim-")
+    database = os.path.join(workdir, "quiz_data.db")
+    shutil.copy(args.database, database)
+    with sqlite3.connect(database) as conn:
+        baseline = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    app_module = load_module("privac-app-nfc.py", "privac_app_nfc")
+    app_module.DATABASE = database
+    server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stats = {key: 0 for key in (
+        "presses_delivered", "cards_delivered", "answers_ok",
+        "answers_failed", "visitors_completed")}
+    browser = SimBrowser(base_url, stats)
+    browser.start()
+
+    clock = SimClock(args.speed)
+    presses, cards, sim_length = build_script(args.visitors, args.think_time, args.hold)
+    gpio = ScriptedGPIO(presses, clock)
+    reader = VirtualNFCReader(cards, clock)
+
+    nfc_module = load_module("nfc-handler.py", "nfc_handler")
+    buttons = ButtonHandler(gpio=gpio, clock=clock, server_url=base_url)
+    cards_daemon = nfc_module.NFCHandler(reader_factory=lambda: reader, clock=clock, server_url=base_url)
+    daemons = [threading.Thread(target=d.run, daemon=True) for d in (buttons, cards_daemon)]
+
+    started = time.monotonic()
+    for thread in daemons:
+        thread.start()
+    try:
+        while not (gpio.finished() and reader.finished()):
+            time.sleep(0.5)
+        # Let the server drain queued presses
+        deadline = time.monotonic() + args.drain
+        while stats["presses_delivered"] < buttons.presses_sent and time.monotonic() < deadline:
+            time.sleep(0.1)
+    finally:
+        real_elapsed = time.monotonic() - started
+        buttons.stop()
+        cards_daemon.stop()
+        browser.stop()
+        server.shutdown()
+
+    with sqlite3.connect(database) as conn:
+        stored = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0] - baseline
+    shutil.rmtree(workdir, ignore_errors=True)
+
+    return dict(stats, **{
+        "visitors": args.visitors,
+        "presses_scripted": len(presses),
+        "presses_sent": buttons.presses_sent,
+        "cards_scripted": len(cards),
+        "cards_sent": cards_daemon.cards_sent,
+        "responses_stored": stored,
+        "sim_seconds": round(sim_length, 1),
+        "real_seconds": round(real_elapsed, 1),
+        "visitors_per_real_minute": round(stats["visitors_completed"] / real_elapsed * 60, 1),
+    })
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate kiosk visitors without hardware")
+    parser.add_argument("--visitors", type=int, default=100)
+    parser.add_argument("--speed", type=float, default=4.0, help="Daemon clock speed-up")
+    parser.add_argument("--think-time", type=float, default=0.8,
+                        help="Simulated seconds between a visitor's inputs")
+    parser.add_argument("--hold", type=float, default=0.15, help="Simulated press duration")
+    parser.add_argument("--drain", type=float, default=10.0,
+                        help="Real seconds to wait for queued events after the script ends")
+    parser.add_argument("--database", default=DATABASE)
+    parser.add_argument("--json", help="Write the report to this file as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run_scenario(args)
+    for key, value in report.items():
+        print(f"{key:<26}{value}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""Startup helpers: lazy imports, background warm-up and an import-time report.
+
+The hardware daemons import their network stacks (requests, socketio) with
+lazy_import(), so the module object exists at once but is only loaded the
+first time an attribute is used, which happens on the background connector
+thread after the daemon is already reading inputs. The apps warm their
+database and template caches on a thread while the server starts.
+
+Import-time regressions show up in the profile report:
+
+    python startup.py profile button_press_handler.py nfc-handler.py privacy-app.py
+    python startup.py profile button_press_handler.py --budget-ms 150
+"""
+import os
+import re
+import sys
+import json
+import time
+import logging
+import threading
+import importlib.util
+
+logger = logging.getLogger(__name__)
+
+_IMPORTED = time.monotonic()
+_promoted = None  # Set when a supervisor standby is promoted (see mark_promoted)
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def lazy_import(name):
+    """Module whose loading is deferred until an attribute is first used.
+
+    A missing module still raises ImportError here, at startup.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named {name!r}")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def mark_promoted():
+    """Measure readiness from now: a pre-warmed standby sat idle until it was promoted"""
+    global _promoted
+    _promoted = time.monotonic()
+
+
+def process_uptime():
+    """Seconds since this process started (since startup.py was imported off Linux)"""
+    if _promoted is not None:
+        return time.monotonic() - _promoted
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - _IMPORTED
+
+
+def log_ready(what):
+    since = "promotion" if _promoted is not None else "process start"
+    logger.info(f"{what} {process_uptime() * 1000:.0f} ms after {since}")
+
+
+def warm_up(*tasks):
+    """Run (name, callable) pairs one after another on a daemon thread"""
+    def run():
+        for name, task in tasks:
+            start = time.perf_counter()
+            try:
+                task()
+                logger.info(f"Warm-up {name} done in {(time.perf_counter() - start) * 1000:.0f} ms")
+            except Exception as e:
+                logger.error(f"Warm-up {name} failed: {str(e)}")
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_database(database):
+    """Switch to WAL, migrate, cache the active content version and close stale sessions"""
+    import sqlite3
+    from database.question_bank import ensure_migrated, active_version
+    from session_store import sessions
+
+    conn = sqlite3.connect(database, timeout=10)
+    try:
+        # Persists in the file: report snapshots and other readers no longer block answer commits.
+        # Databases made before setup_db.py enabled WAL are still in rollback-journal mode.
+        mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if mode != "wal":
+            logger.warning(f"Database stays in {mode} journal mode; readers will block writes")
+        ensure_migrated(conn)
+        active_version(conn)
+    finally:
+        conn.close()
+    sessions.reap(database)
+
+
+def warm_templates(app, templates):
+    """Compile page templates into the Jinja cache before the first visitor"""
+    for template in templates:
+        app.jinja_env.get_template(template)
+
+
+def import_profile(path):
+    """Import `path` (without running its __main__ block) under -X importtime"""
+    import subprocess  # The daemons import this module; keep its own import cheap
+    name = os.path.splitext(os.path.basename(path))[0].replace("-", "_")
+    code = (
+        "import importlib.util, sys, time\n"
+        "start = time.perf_counter()\n"
+        f"spec = importlib.util.spec_from_file_location({name!r}, {os.path.abspath(path)!r})\n"
+        "module = importlib.util.module_from_spec(spec)\n"
+        f"sys.modules[{name!r}] = module\n"
+        "spec.loader.exec_module(module)\n"
+        "print(f'wall_us={(time.perf_counter() - start) * 1e6:.0f}')\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(path))
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append({
+                "module": module,
+                "self_ms": int(self_us) / 1000,
+                "cumulative_ms": int(cumulative_us) / 1000,
+                "top_level": not indent,
+            })
+    wall = re.search(r"wall_us=(\d+)", result.stdout)
+    return {
+        "target": path,
+        "ok": result.returncode == 0,
+        "error": result.stderr.strip().splitlines()[-1] if result.returncode else None,
+        "total_ms": int(wall.group(1)) / 1000 if wall else None,
+        "modules": modules,
+    }
+
+
+def print_profile(report, top):
+    print(f"\n{report['target']}: "
+          + (f"{report['total_ms']:.1f} ms to import" if report["ok"] else f"FAILED ({report['error']})"))
+    heaviest = sorted((m for m in report["modules"] if m["top_level"]),
+                      key=lambda m: m["cumulative_ms"], reverse=True)[:top]
+    for module in heaviest:
+        print(f"  {module['cumulative_ms']:>9.1f} ms  {module['module']}")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Startup tooling for the kiosk processes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    profile = commands.add_parser("profile", help="Report import time per top-level module")
+    profile.add_argument("targets", nargs="+")
+    profile.add_argument("--top", type=int, default=10)
+    profile.add_argument("--budget-ms", type=float, help="Exit non-zero if a target imports slower")
+    profile.add_argument("--json", help="Write the full report to this file")
+    args = parser.parse_args()
+
+    reports = [import_profile(target) for target in args.targets]
+    for report in reports:
+        print_profile(report, args.top)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+    over = [r["target"] for r in reports
+            if not r["ok"] or (args.budget_ms and r["total_ms"] > args.budget_ms)]
+    if over:
+        print(f"\nOver budget or failed: {', '.join(over)}")
+        sys.exit(1)
@@ -1,3 +1,11 @@
+// Offline layer: precached pages and a local answer queue (static/service-worker.js)
+if ("serviceWorker" in navigator) {
+    navigator.serviceWorker.register("/service-worker.js")
+        .catch(error => console.error("Service worker registration failed:", error));
+}
+
+let gpioRetryDelay = 1000;
+
 document.addEventListener("DOMContentLoaded", function() {
     // Skip if we're on the quiz page
     if (window.location.pathname === '/quiz') {
@@ -21,33 +29,66 @@ function setupGPIOListeners() {
     
     const eventSource = new EventSource('/gpio-events');
 
+    // Keep-alives arrive as SSE comments and never reach onmessage
     eventSource.onmessage = function(event) {
         try {
-            if (event.data.includes("heartbeat")) return;
-
-            const data = JSON.parse(event.data);
-            console.log("Navigation GPIO event:", data);
-
-            if (data.choice) {
-                handleButtonPress(data.choice);
-            }
+            const receivedAt = Date.now();
+            decodeFrame(event.data).forEach(data => {
+                console.log("Navigation GPIO event:", data);
+                // Long presses have no navigation action; a double press still navigates
+                if (data.type === "choice" && data.gesture !== "long_press") {
+                    handleButtonPress(data.choice);
+                    reportLatency(data, receivedAt);
+                }
+            });
         } catch (e) {
-            if (!event.data.includes("heartbeat")) {
-                console.error("Navigation GPIO error:", e);
-            }
+            console.error("Navigation GPIO error:", e);
         }
     };
 
     eventSource.onerror = function(error) {
         console.error("GPIO EventSource error:", error);
-        setTimeout(setupGPIOListeners, 5000);
+        // Close before reconnecting so retries don't pile up open streams
+        eventSource.close();
+        setTimeout(setupGPIOListeners, gpioRetryDelay);
+        gpioRetryDelay = Math.min(gpioRetryDelay * 2, 10000);
     };
 
     eventSource.onopen = function() {
         console.log("GPIO EventSource connected");
+        gpioRetryDelay = 1000;
+        // Server is reachable again: send answers queued while offline
+        navigator.serviceWorker?.controller?.postMessage("replay");
     };
 }
 
+// Gesture codes carried by long/double presses (see debounce.py)
+const GESTURES = { h: "long_press", d: "double_press" };
+
+// Decode a wire frame (see wire.py): [sent_ms, [code, ...fields], ...]
+function decodeFrame(text) {
+    const [sentMs, ...events] = JSON.parse(text);
+    return events.map(event => event[0] === "c"
+        ? { type: "choice", choice: event[1] === "l" ? "left" : "right", trace_id: event[2],
+            gesture: GESTURES[event[3]] || "press", sent_ms: sentMs }
+        : { type: "card", data: event[1], sent_ms: sentMs });
+}
+
+// Report browser receive/render times for a traced button press
+function reportLatency(data, receivedAt) {
+    if (!data.trace_id) return;
+
+    requestAnimationFrame(() => {
+        const body = new Blob([JSON.stringify({
+            trace_id: data.trace_id,
+            sent_ms: data.sent_ms,
+            received_ms: receivedAt,
+            rendered_ms: Date.now()
+        })], { type: "application/json" });
+        navigator.sendBeacon("/metrics/latency", body);
+    });
+}
+
 function setupButtonHandlers() {
     // Handle button clicks with debouncing
     document.querySelectorAll('[data-gpio]').forEach(button => {
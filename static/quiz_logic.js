@@ -4,9 +4,19 @@ let sessionId = localStorage.getItem("sessionId") || "";
 let rightClickCount = 0;
 let selectedSet = null;
 let gpioEnabled = false;
+let pendingTrace = null;
+let bootstrap = null;
+let gpioRetryDelay = 1000;
+
+// Offline layer: precached pages and a local answer queue (static/service-worker.js)
+if ("serviceWorker" in navigator) {
+    navigator.serviceWorker.register("/service-worker.js")
+        .catch(error => console.error("Service worker registration failed:", error));
+}
 
 document.addEventListener("DOMContentLoaded", function () {
-    document.getElementById("question-set-overlay").style.display = "flex";
+    bootstrap = readBootstrap();
+    document.getElementById("question-set-overlay").style.display = bootstrap ? "none" : "flex";
     gpioEnabled = document.body.getAttribute("data-gpio-enabled") === "true";
 
     // Setup basic button listeners
@@ -35,18 +45,23 @@ function setupGPIOListeners() {
     
     const eventSource = new EventSource('/gpio-events');
 
+    // Keep-alives arrive as SSE comments and never reach onmessage
     eventSource.onmessage = function(event) {
         try {
-            // Skip processing heartbeat messages
-            if (event.data.includes("heartbeat")) {
-                return;
-            }
-
-            console.log("Raw SSE data:", event.data);
-            const data = JSON.parse(event.data);
-
-            if (data.choice && (data.choice === "left" || data.choice === "right")) {
+            const receivedAt = Date.now();
+            decodeFrame(event.data).forEach(data => {
+                // Long presses have no quiz action; a double press still answers
+                if (data.type !== "choice" || data.gesture === "long_press") return;
                 console.log(`Processing GPIO button press: ${data.choice}`);
+
+                // Latency trace is completed once the next question is painted
+                if (data.trace_id) {
+                    pendingTrace = {
+                        trace_id: data.trace_id,
+                        sent_ms: data.sent_ms,
+                        received_ms: receivedAt
+                    };
+                }
                 
                 // Trigger the corresponding button press
                 handleResponse(data.choice);
@@ -57,31 +72,64 @@ function setupGPIOListeners() {
                     button.classList.add('active');
                     setTimeout(() => button.classList.remove('active'), 200);
                 }
-            }
+            });
         } catch (e) {
-            if (!event.data.includes("heartbeat")) {
-                console.error("Error parsing GPIO event:", e);
-                console.error("Raw event data:", event.data);
-            }
+            console.error("Error parsing GPIO event:", e);
+            console.error("Raw event data:", event.data);
         }
     };
 
     eventSource.onerror = function(error) {
         console.error("GPIO EventSource error:", error);
-        setTimeout(setupGPIOListeners, 5000);
+        // Close before reconnecting so retries don't pile up open streams
+        eventSource.close();
+        setTimeout(setupGPIOListeners, gpioRetryDelay);
+        gpioRetryDelay = Math.min(gpioRetryDelay * 2, 10000);
     };
 
     eventSource.onopen = function() {
         console.log("GPIO EventSource connected");
+        gpioRetryDelay = 1000;
+        // Server is reachable again: send answers queued while offline
+        navigator.serviceWorker?.controller?.postMessage("replay");
     };
 }
 
+// Gesture codes carried by long/double presses (see debounce.py)
+const GESTURES = { h: "long_press", d: "double_press" };
+
+// Decode a wire frame (see wire.py): [sent_ms, [code, ...fields], ...]
+function decodeFrame(text) {
+    const [sentMs, ...events] = JSON.parse(text);
+    return events.map(event => event[0] === "c"
+        ? { type: "choice", choice: event[1] === "l" ? "left" : "right", trace_id: event[2],
+            gesture: GESTURES[event[3]] || "press", sent_ms: sentMs }
+        : { type: "card", data: event[1], sent_ms: sentMs });
+}
+
 function selectQuestionSet(setId) {
     selectedSet = setId;
     document.getElementById("question-set-overlay").style.display = "none";
 
-    fetch(`/fetch_questions?set_id=${setId}`)
-        .then(response => response.json())
+    const params = new URLSearchParams({ set_id: setId });
+    if (sessionId) {
+        params.set("session_id", sessionId);
+    }
+
+    fetch(`/fetch_questions?${params}`)
+        .then(response => {
+            // The server opens (or reuses) the session the answers belong to
+            const serverSession = response.headers.get("X-Session-Id");
+            if (serverSession) {
+                sessionId = serverSession;
+                localStorage.setItem("sessionId", sessionId);
+            } else if (!sessionId) {
+                // Offline copy from the service worker: group this visitor's queued answers
+                sessionId = `offline-${Date.now()}-${Math.random().toString(36).slice(2, 10)}`;
+                localStorage.setItem("sessionId", sessionId);
+            }
+            return response.json();
+        })
         .then(data => {
             console.log("✅ Fetched Questions:", data.length, data);
             if (!data || data.length === 0) {
@@ -118,6 +166,7 @@ function loadQuestion() {
             document.getElementById("question-text").innerText = q.question;
             document.getElementById("left-text").innerText = q.left_choice;
             document.getElementById("right-text").innerText = q.right_choice;
+            reportLatency(false);
         }, 50);
     } else {
         console.log("✅ All questions answered, determining result...");
@@ -182,14 +231,90 @@ function handleResponse(choice) {
     .catch(error => console.error("❌ Error submitting response:", error));
 }
 
+function reportLatency(immediate) {
+    if (!pendingTrace) return;
+    const trace = pendingTrace;
+    pendingTrace = null;
+
+    const send = () => {
+        trace.rendered_ms = Date.now();
+        const body = new Blob([JSON.stringify(trace)], { type: "application/json" });
+        navigator.sendBeacon("/metrics/latency", body);
+    };
+    // Wait for the paint unless the page is about to navigate away
+    immediate ? send() : requestAnimationFrame(send);
+}
+
+function readBootstrap() {
+    const element = document.getElementById("quiz-bootstrap");
+    try {
+        return element ? JSON.parse(element.textContent) : null;
+    } catch (e) {
+        console.error("Invalid quiz bootstrap payload:", e);
+        return null;
+    }
+}
+
+function applyBootstrap() {
+    if (!bootstrap || bootstrap.status !== "active" || bootstrap.index >= bootstrap.questions.length) {
+        return false;
+    }
+    console.log(`✅ Starting session ${bootstrap.session_id} at question ${bootstrap.index + 1}`);
+    sessionId = bootstrap.session_id;
+    localStorage.setItem("sessionId", sessionId);
+    selectedSet = bootstrap.set_id;
+    questions = bootstrap.questions;
+    currentIndex = bootstrap.index;
+    rightClickCount = bootstrap.right_count;
+    loadQuestion();
+    return true;
+}
+
+function resumeSession() {
+    if (!sessionId) {
+        return Promise.resolve(false);
+    }
+
+    return fetch(`/quiz/session?session_id=${encodeURIComponent(sessionId)}`)
+        .then(response => response.ok ? response.json() : null)
+        .then(data => {
+            if (!data || data.status !== "active" || data.index >= data.questions.length) {
+                return false;
+            }
+            console.log(`✅ Resuming session at question ${data.index + 1}`);
+            document.getElementById("question-set-overlay").style.display = "none";
+            selectedSet = data.set_id;
+            questions = data.questions;
+            currentIndex = data.index;
+            rightClickCount = data.right_count;
+            loadQuestion();
+            return true;
+        })
+        .catch(() => false);
+}
+
 function determineResultPage() {
+    reportLatency(true);
+    // The next visitor starts a fresh session
+    localStorage.removeItem("sessionId");
+    document.cookie = "quiz_session=; max-age=0; path=/";
     console.log(`📊 Final right clicks: ${rightClickCount}`);
     let pageNumber = Math.min(rightClickCount, 5);
-    let redirectPage = `/${pageNumber}.html`;
+    let redirectPage = (bootstrap && bootstrap.results && bootstrap.results[pageNumber]) || `/${pageNumber}.html`;
     console.log(`🔗 Redirecting to: ${redirectPage}`);
     window.location.href = redirectPage;
 }
 
 
-// Auto-select set 2 for testing or faking 
-document.addEventListener("DOMContentLoaded", () => setTimeout(() => selectQuestionSet(2), 100));
+// Start from the inlined bootstrap; without one, resume an unfinished quiz after a reload,
+// otherwise auto-select set 2 for testing or faking
+document.addEventListener("DOMContentLoaded", () => {
+    if (applyBootstrap()) {
+        return;
+    }
+    resumeSession().then(resumed => {
+        if (!resumed) {
+            setTimeout(() => selectQuestionSet(2), 100);
+        }
+    });
+});
@@ -0,0 +1,318 @@
+// Offline layer for the kiosk pages.
+//
+// - Precaches every page and static asset listed in /offline-manifest.json
+// - Serves navigation from cache (the quiz page is tried on the network first)
+// - Answers /handle-navigation from the manifest's navigation map when offline
+// - Queues /submit_response in IndexedDB and replays it via /submit_responses
+
+const MANIFEST_URL = "/offline-manifest.json";
+const MANIFEST_CHECK_INTERVAL = 60 * 1000;
+const QUIZ_NETWORK_TIMEOUT = 1500;
+const DB_NAME = "privacy-pac-offline";
+const QUEUE_STORE = "answers";
+const REPLAY_BATCH = 100;
+
+let manifest = null;
+let lastManifestCheck = 0;
+let replaying = null;
+
+// ---------------------------------------------------------------- precache
+
+async function precache(data) {
+    const cache = await caches.open(data.cache);
+    const entries = [
+        ...Object.entries(data.pages),
+        ...Object.entries(data.questions || {}),
+        ...data.assets.map(url => [url, url])
+    ];
+    // One missing asset shouldn't leave the kiosk without any cache
+    await Promise.all(entries.map(async ([key, source]) => {
+        try {
+            const response = await fetch(source, { cache: "no-store" });
+            if (response.ok) {
+                await cache.put(key, await stripped(response));
+            }
+        } catch (e) {
+            console.warn("Precache failed for", source, e);
+        }
+    }));
+    await cache.put(MANIFEST_URL, new Response(JSON.stringify(data), {
+        headers: { "Content-Type": "application/json" }
+    }));
+    manifest = data;
+}
+
+// Drop per-visitor headers (session id, cookies) from cached copies
+async function stripped(response) {
+    const headers = new Headers({ "Content-Type": response.headers.get("Content-Type") || "" });
+    const version = response.headers.get("X-Question-Version");
+    if (version) {
+        headers.set("X-Question-Version", version);
+    }
+    return new Response(await response.blob(), { status: response.status, headers });
+}
+
+async function currentManifest() {
+    if (manifest) return manifest;
+    const cached = await caches.match(MANIFEST_URL);
+    manifest = cached ? await cached.json() : null;
+    return manifest;
+}
+
+// Re-precache when templates or assets changed on the server
+async function checkManifest() {
+    const now = Date.now();
+    if (now - lastManifestCheck < MANIFEST_CHECK_INTERVAL) return;
+    lastManifestCheck = now;
+    try {
+        const response = await fetch(MANIFEST_URL, { cache: "no-store" });
+        const data = await response.json();
+        const current = await currentManifest();
+        if (!current || current.version !== data.version) {
+            await precache(data);
+            await dropOldCaches(data.cache);
+        }
+        replayQueue();
+    } catch (e) {
+        // Server unreachable; keep serving the cache we have
+    }
+}
+
+async function dropOldCaches(keep) {
+    const names = await caches.keys();
+    await Promise.all(names.filter(name => name.startsWith("privacy-pac-") && name !== keep)
+        .map(name => caches.delete(name)));
+}
+
+self.addEventListener("install", event => {
+    event.waitUntil(
+        fetch(MANIFEST_URL, { cache: "no-store" })
+            .then(response => response.json())
+            .then(precache)
+            .then(() => self.skipWaiting())
+    );
+});
+
+self.addEventListener("activate", event => {
+    event.waitUntil(
+        currentManifest()
+            .then(data => data && dropOldCaches(data.cache))
+            .then(() => self.clients.claim())
+            .then(() => replayQueue())
+    );
+});
+
+// ------------------------------------------------------------------- fetch
+
+function pagePath(url) {
+    const path = url.pathname.replace(/\.html$/, "");
+    return path === "" ? "/" : path;
+}
+
+function withTimeout(promise, ms) {
+    return new Promise((resolve, reject) => {
+        const timer = setTimeout(() => reject(new Error("timeout")), ms);
+        promise.then(value => { clearTimeout(timer); resolve(value); },
+                     error => { clearTimeout(timer); reject(error); });
+    });
+}
+
+async function fromCache(key) {
+    const data = await currentManifest();
+    if (!data) return undefined;
+    const cache = await caches.open(data.cache);
+    return cache.match(key, { ignoreSearch: false });
+}
+
+async function handleNavigate(request) {
+    const url = new URL(request.url);
+    const path = pagePath(url);
+    checkManifest();
+
+    if (path === "/quiz") {
+        // The live quiz page carries the visitor's session; the shell is the fallback
+        try {
+            return await withTimeout(fetch(request), QUIZ_NETWORK_TIMEOUT);
+        } catch (e) {
+            return (await fromCache("/quiz")) || Response.error();
+        }
+    }
+
+    const cached = await fromCache(path);
+    if (cached) return cached;
+    try {
+        return await fetch(request);
+    } catch (e) {
+        return (await fromCache("/")) || Response.error();
+    }
+}
+
+async function handleNavigationPost(request) {
+    const body = await request.clone().json().catch(() => ({}));
+    try {
+        return await withTimeout(fetch(request), QUIZ_NETWORK_TIMEOUT);
+    } catch (e) {
+        // Same rules as handle_navigation() on the server
+        const data = await currentManifest();
+        const page = (body.current_page || "").replace(/\.html$/, "");
+        let redirect = "/";
+        if (page === "/quiz") {
+            redirect = null;
+        } else if (data && data.navigation[page]) {
+            redirect = data.navigation[page][body.choice] || "/";
+        }
+        return jsonResponse({ redirect, offline: true });
+    }
+}
+
+async function handleQuestions(request) {
+    const url = new URL(request.url);
+    const key = `/fetch_questions?set_id=${url.searchParams.get("set_id") || "2"}`;
+    try {
+        const response = await fetch(request);
+        if (response.ok) {
+            const data = await currentManifest();
+            if (data) {
+                const cache = await caches.open(data.cache);
+                await cache.put(key, await stripped(response.clone()));
+            }
+        }
+        return response;
+    } catch (e) {
+        return (await fromCache(key)) || jsonResponse({ error: "Offline" }, 503);
+    }
+}
+
+async function handleAnswer(request) {
+    const body = await request.clone().json();
+    // Keep answers in order: once anything is queued, new ones queue behind it
+    if (!(await queueLength())) {
+        try {
+            const response = await fetch(request);
+            if (response.status < 500) return response;
+        } catch (e) {
+            // Fall through to the queue
+        }
+    }
+    body.answered_at = Date.now();
+    await enqueue(body);
+    replayQueue();
+    return jsonResponse({ session_id: body.session_id, queued: true }, 202);
+}
+
+function jsonResponse(data, status = 200) {
+    return new Response(JSON.stringify(data), {
+        status,
+        headers: { "Content-Type": "application/json" }
+    });
+}
+
+self.addEventListener("fetch", event => {
+    const request = event.request;
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.mode === "navigate") {
+        event.respondWith(handleNavigate(request));
+    } else if (request.method === "POST" && url.pathname === "/submit_response") {
+        event.respondWith(handleAnswer(request));
+    } else if (request.method === "POST" && url.pathname === "/handle-navigation") {
+        event.respondWith(handleNavigationPost(request));
+    } else if (request.method === "GET" && url.pathname === "/fetch_questions") {
+        event.respondWith(handleQuestions(request));
+    } else if (request.method === "GET" && url.pathname.startsWith("/static/")) {
+        event.respondWith(fromCache(url.pathname).then(cached => cached || fetch(request)));
+    }
+    // Everything else (SSE, Socket.IO, metrics) goes straight to the network
+});
+
+self.addEventListener("message", event => {
+    if (event.data === "replay") {
+        event.waitUntil(replayQueue());
+    }
+});
+
+self.addEventListener("sync", event => {
+    if (event.tag === "replay-answers") {
+        event.waitUntil(replayQueue());
+    }
+});
+
+// ------------------------------------------------------------ answer queue
+
+function openQueue() {
+    return new Promise((resolve, reject) => {
+        const open = indexedDB.open(DB_NAME, 1);
+        open.onupgradeneeded = () => {
+            open.result.createObjectStore(QUEUE_STORE, { autoIncrement: true });
+        };
+        open.onsuccess = () => resolve(open.result);
+        open.onerror = () => reject(open.error);
+    });
+}
+
+function withStore(mode, action) {
+    return openQueue().then(db => new Promise((resolve, reject) => {
+        const tx = db.transaction(QUEUE_STORE, mode);
+        const result = action(tx.objectStore(QUEUE_STORE));
+        tx.oncomplete = () => { db.close(); resolve(result.result !== undefined ? result.result : result); };
+        tx.onerror = () => { db.close(); reject(tx.error); };
+    }));
+}
+
+function enqueue(answer) {
+    return withStore("readwrite", store => store.add(answer));
+}
+
+function queueLength() {
+    return withStore("readonly", store => store.count());
+}
+
+function readQueue(limit) {
+    return openQueue().then(db => new Promise((resolve, reject) => {
+        const items = [];
+        const tx = db.transaction(QUEUE_STORE, "readonly");
+        tx.objectStore(QUEUE_STORE).openCursor().onsuccess = event => {
+            const cursor = event.target.result;
+            if (cursor && items.length < limit) {
+                items.push({ key: cursor.key, value: cursor.value });
+                cursor.continue();
+            }
+        };
+        tx.oncomplete = () => { db.close(); resolve(items); };
+        tx.onerror = () => { db.close(); reject(tx.error); };
+    }));
+}
+
+function removeFromQueue(keys) {
+    return withStore("readwrite", store => {
+        keys.forEach(key => store.delete(key));
+        return {};
+    });
+}
+
+// Send queued answers in batches, oldest first, until the queue is empty
+function replayQueue() {
+    if (replaying) return replaying;
+    replaying = (async () => {
+        try {
+            while (true) {
+                const items = await readQueue(REPLAY_BATCH);
+                if (!items.length) break;
+                const response = await fetch("/submit_responses", {
+                    method: "POST",
+                    headers: { "Content-Type": "application/json" },
+                    body: JSON.stringify({ responses: items.map(item => item.value) })
+                });
+                if (!response.ok) break;
+                await removeFromQueue(items.map(item => item.key));
+                console.log(`Replayed ${items.length} queued answers`);
+            }
+        } catch (e) {
+            // Still offline; the next successful request or sync retries
+        } finally {
+            replaying = null;
+        }
+    })();
+    return replaying;
+}
@@ -0,0 +1,219 @@
+"""Process supervisor for the kiosk: the app and both hardware daemons.
+
+    python supervisor.py                       # app, buttons and nfc
+    python supervisor.py buttons nfc           # only some components
+    python supervisor.py --no-standby
+
+Every component runs in its own process and is restarted whenever it
+exits. A component is also restarted when it stops sending heartbeats
+(liveness.py) over the supervisor's local UDP socket for HEARTBEAT_TIMEOUT
+seconds. It gets STARTUP_GRACE seconds for its first one.
+
+For each running component the supervisor keeps one standby process that
+has already imported the component's modules (Flask, Socket.IO, requests,
+nfcpy, ...) and waits for a "go" line on stdin. A crashed component is
+replaced by promoting its standby, which only has to run the script
+itself. It does not touch GPIO or the NFC reader before it is promoted.
+The first restart is immediate. Further crashes back off exponentially
+(BACKOFF_INITIAL doubling up to BACKOFF_MAX), and the count resets once
+a component stays up for STABLE_AFTER seconds.
+
+The app component is privac-app-nfc.py: privacy-app.py runs the debug
+reloader, which forks a serving child the supervisor would not be watching.
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import subprocess
+
+from log_setup import configure_logging
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+COMPONENTS = {
+    "app": "privac-app-nfc.py",
+    "buttons": "button_press_handler.py",
+    "nfc": "nfc-handler.py",
+}
+# Modules a component only loads lazily, imported by its standby as well
+WARM_IMPORTS = {
+    "buttons": ["requests"],
+    "nfc": ["socketio"],
+}
+HEARTBEAT_TIMEOUT = float(os.environ.get("SUPERVISOR_HEARTBEAT_TIMEOUT", "5"))
+STARTUP_GRACE = float(os.environ.get("SUPERVISOR_STARTUP_GRACE", "20"))
+BACKOFF_INITIAL = 0.5
+BACKOFF_MAX = 30.0
+STABLE_AFTER = 30.0
+STOP_TIMEOUT = 2.0
+TICK = 0.05
+
+
+class Component:
+    def __init__(self, name, env, standby=True):
+        self.name = name
+        self.env = dict(env, SUPERVISOR_COMPONENT=name)
+        self.use_standby = standby
+        self.process = None
+        self.standby = None
+        self.started = None
+        self.last_beat = None
+        self.failures = 0
+        self.restart_at = 0.0
+        self.down_since = None
+
+    def spawn(self):
+        """A new standby process: imports done, waiting to be promoted"""
+        return subprocess.Popen([sys.executable, os.path.join(ROOT, "supervisor.py"), "standby", self.name],
+                                stdin=subprocess.PIPE, cwd=ROOT, env=self.env)
+
+    def start(self, now):
+        standby, self.standby = self.standby, None
+        warm = standby is not None and standby.poll() is None
+        process = standby if warm else self.spawn()
+        try:
+            process.stdin.write(b"go\n")
+            process.stdin.close()
+        except BrokenPipeError:
+            warm, process = False, self.spawn()  # The standby died just now
+            process.stdin.write(b"go\n")
+            process.stdin.close()
+        self.process, self.started, self.last_beat = process, now, None
+        if self.down_since is None:
+            logger.info(f"Started {self.name} (pid {process.pid})")
+        else:
+            kind = "standby" if warm else "cold start"
+            logger.info(f"Restarted {self.name} (pid {process.pid}, {kind}) "
+                        f"{(now - self.down_since) * 1000:.0f} ms after it went down")
+        self.down_since = None
+
+    def beat(self, pid, now):
+        if self.process is not None and self.process.pid == pid:
+            self.last_beat = now
+
+    def check(self, now):
+        """Restart, replace the standby or give up on a silent process; called every TICK"""
+        if self.process is not None:
+            code = self.process.poll()
+            if code is not None:
+                self.crashed(now, f"exited with code {code}")
+            elif now > (self.last_beat + HEARTBEAT_TIMEOUT if self.last_beat is not None
+                        else self.started + STARTUP_GRACE):
+                stop(self.process)
+                self.crashed(time.monotonic(), "stopped sending heartbeats")
+            elif self.failures and now - self.started > STABLE_AFTER:
+                self.failures = 0
+
+        if self.process is None and now >= self.restart_at:
+            self.start(now)
+        # Warm the next standby once the running process is up, not while it is starting
+        if self.use_standby and self.last_beat is not None:
+            if self.standby is None or self.standby.poll() is not None:
+                self.standby = self.spawn()
+
+    def crashed(self, now, reason):
+        self.failures += 1
+        delay = 0.0 if self.failures == 1 else min(BACKOFF_MAX, BACKOFF_INITIAL * 2 ** (self.failures - 2))
+        logger.error(f"{self.name} (pid {self.process.pid}) {reason}; restarting in {delay:g}s")
+        self.process, self.restart_at, self.down_since = None, now + delay, now
+
+    def shutdown(self):
+        for process in (self.process, self.standby):
+            if process is not None:
+                stop(process)
+
+
+def stop(process):
+    """SIGTERM, then SIGKILL after STOP_TIMEOUT"""
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(STOP_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def supervise(names, standby=True, port=0):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(("127.0.0.1", port))
+    sock.settimeout(TICK)
+    env = dict(os.environ, SUPERVISOR_ADDR=f"127.0.0.1:{sock.getsockname()[1]}")
+    components = {name: Component(name, env, standby) for name in names}
+    logger.info(f"Supervising {', '.join(names)} (heartbeats on udp {env['SUPERVISOR_ADDR']})")
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    try:
+        while not stopping:
+            try:
+                message, _ = sock.recvfrom(256)
+                name, pid = message.decode().split()
+                if name in components:
+                    components[name].beat(int(pid), time.monotonic())
+            except socket.timeout:
+                pass
+            except ValueError:
+                logger.warning(f"Malformed heartbeat: {message!r}")
+            now = time.monotonic()
+            for component in components.values():
+                component.check(now)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Stopping components...")
+        for component in components.values():
+            component.shutdown()
+        sock.close()
+
+
+def run_standby(name):
+    """Import a component's modules, wait for "go" on stdin, then run it as __main__"""
+    import ast
+    import runpy
+    import importlib
+    from startup import mark_promoted
+
+    path = os.path.join(ROOT, COMPONENTS[name])
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    modules = [alias.name for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names]
+    modules += [node.module for node in ast.walk(tree)
+                if isinstance(node, ast.ImportFrom) and node.module and not node.level]
+    for module in modules + WARM_IMPORTS.get(name, []):
+        try:
+            importlib.import_module(module)
+        except Exception:
+            pass  # The component reports its own missing modules once it runs
+
+    if sys.stdin.readline().strip() != "go":
+        return  # Supervisor went away without promoting us
+    mark_promoted()
+    sys.argv = [path]
+    runpy.run_path(path, run_name="__main__")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["standby"]:
+        run_standby(sys.argv[2])
+        sys.exit(0)
+
+    import argparse
+    parser = argparse.ArgumentParser(description="Run and restart the Privacy-Pac components")
+    parser.add_argument("components", nargs="*",
+                        help=f"Components to run: {', '.join(COMPONENTS)} (default: all)")
+    parser.add_argument("--no-standby", action="store_true", help="Do not keep pre-warmed standby processes")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("SUPERVISOR_PORT", "0")),
+                        help="Local UDP port for heartbeats (default: any free port)")
+    args = parser.parse_args()
+    unknown = [name for name in args.components if name not in COMPONENTS]
+    if unknown:
+        parser.error(f"unknown component(s): {', '.join(unknown)}")
+
+    configure_logging("supervisor")
+    supervise(args.components or list(COMPONENTS), standby=not args.no_standby, port=args.port)
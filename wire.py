@@ -0,0 +1,84 @@
+"""Compact encoding for events pushed to the kiosk pages.
+
+One frame carries every event that was ready when it was written:
+
+    [sent_ms, [code, ...fields], [code, ...fields], ...]
+
+sent_ms is the server's wall-clock time when the frame was written (used
+by latency tracing); each event starts with a one-letter type code:
+
+    ["c", "l"|"r", trace_id]   button press (left/right)
+    ["c", "l"|"r", trace_id, "h"|"d"]
+                               long press / double press (see debounce.py)
+    ["n", {card payload}]      NFC card detected
+    ["j", "l"|"r", client_id]  joystick hover (coalesced, see joystick.py)
+    ["s", "l"|"r", client_id]  joystick select
+
+Frames go out as a single SSE `data:` line, or as the argument of the
+Socket.IO SOCKET_EVENT. When nothing has been sent for HEARTBEAT_IDLE
+seconds the SSE stream writes a comment line instead, which keeps proxies
+and the connection alive without waking the page's onmessage handler.
+The layout is plain arrays so it can move to MessagePack unchanged.
+"""
+import json
+import time
+
+CHOICE = "c"
+CARD = "n"
+HOVER = "j"
+SELECT = "s"
+CHOICE_CODES = {"left": "l", "right": "r"}
+CHOICES = {code: choice for choice, code in CHOICE_CODES.items()}
+PRESS = "press"
+LONG_PRESS = "long_press"
+DOUBLE_PRESS = "double_press"
+GESTURE_CODES = {LONG_PRESS: "h", DOUBLE_PRESS: "d"}  # Plain presses carry no code
+GESTURES = {code: gesture for gesture, code in GESTURE_CODES.items()}
+
+SOCKET_EVENT = "e"
+HEARTBEAT_IDLE = 15.0  # Seconds of silence before an SSE keep-alive comment
+SSE_HEARTBEAT = ": hb\n\n"
+MAX_BATCH = 50  # Events per frame; the rest go out in the next frame
+
+
+def choice_event(event):
+    """Queued GPIO event dict -> wire event"""
+    encoded = [CHOICE, CHOICE_CODES[event["choice"]], event.get("trace_id")]
+    gesture = event.get("gesture", PRESS)
+    if gesture != PRESS:
+        encoded.append(GESTURE_CODES[gesture])
+    return encoded
+
+
+def card_event(payload):
+    return [CARD, payload]
+
+
+def coalesce_key(event):
+    """Events sharing a key supersede each other when a backlog is coalesced"""
+    return (event[0], event[2]) if event[0] in (HOVER, SELECT) else event[0]
+
+
+def frame(events):
+    return json.dumps([int(time.time() * 1000), *events], separators=(",", ":"))
+
+
+def sse_frame(events):
+    return f"data: {frame(events)}\n\n"
+
+
+def decode(data):
+    """Frame text -> (sent_ms, [event dicts]) for Python consumers"""
+    sent_ms, *events = json.loads(data)
+    decoded = []
+    for event in events:
+        if event[0] == CHOICE:
+            gesture = GESTURES.get(event[3], PRESS) if len(event) > 3 else PRESS
+            decoded.append({"type": "choice", "choice": CHOICES[event[1]], "trace_id": event[2],
+                            "gesture": gesture})
+        elif event[0] == CARD:
+            decoded.append({"type": "card", "data": event[1]})
+        elif event[0] in (HOVER, SELECT):
+            decoded.append({"type": "joystick" if event[0] == HOVER else "select",
+                            "direction": CHOICES[event[1]], "client_id": event[2]})
+    return sent_ms, decoded